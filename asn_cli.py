@@ -0,0 +1,139 @@
+"""Headless ASN template generation driven by a saved mapping profile
+
+Usage:
+    python asn_cli.py --profile supplier.json "inbound/*.xlsx" --output-dir out/
+    python asn_cli.py --profile supplier.json --lookup owners=masters/owners.xlsx shipment.csv
+
+Several sources (or a folder) are processed in parallel worker processes.
+Prints a JSON summary to stdout (or --summary FILE). Exit code is 0 when
+every source file was generated, 1 when any failed, 2 on bad arguments.
+Does not import tkinter, so it runs on machines without a display.
+"""
+import time
+_START = time.perf_counter()
+
+import argparse
+import json
+import os
+import sys
+import warnings
+warnings.filterwarnings('ignore')
+
+from asn_engine import (DEFAULT_CHUNK_ROWS, OUTPUT_FORMATS, check_split_column, expand_sources,
+                        load_lookup_file, load_profile, lookup_columns, plan_lookups, run_batch, LookupCache)
+
+
+def parse_lookup_args(values):
+    """--lookup NAME=PATH arguments as {name: path}"""
+    lookup_paths = {}
+    for value in values:
+        name, sep, path = value.partition('=')
+        if not sep or not name or not path:
+            raise argparse.ArgumentTypeError(f"--lookup expects NAME=PATH, got '{value}'")
+        lookup_paths[name] = path
+    return lookup_paths
+
+
+def load_lookup_files(lookup_paths, mappings, cache=None):
+    """Load {name: path} lookups, returns (lookup_files, {name: status entry})
+    
+    Only the columns the mappings' lookups use are read from each file
+    (from the LookupCache when one is given and the file is unchanged).
+    """
+    needed_columns = lookup_columns(plan_lookups(mappings))
+    lookup_files = {}
+    statuses = {}
+    for name, path in lookup_paths.items():
+        try:
+            lookup_files[name] = load_lookup_file(path, columns=needed_columns.get(name, []), cache=cache)
+            statuses[name] = {'path': path, 'status': 'ok'}
+        except Exception as e:
+            statuses[name] = {'path': path, 'status': 'error', 'error': str(e)}
+    return lookup_files, statuses
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate ASN templates without the GUI.")
+    parser.add_argument('sources', nargs='*', help="source files, folders or glob patterns")
+    parser.add_argument('--profile', help="mapping profile (JSON)")
+    parser.add_argument('--lookup', action='append', default=[], metavar='NAME=PATH',
+                        help="lookup file, overrides the profile's path for NAME (repeatable)")
+    parser.add_argument('--output-dir', default=None, help="output directory (default: current directory)")
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='xlsx', help="output format (default: xlsx)")
+    parser.add_argument('--split-by', default=None, metavar='ASN_COLUMN',
+                        help="write one file per value of this ASN column, e.g. GenericKey")
+    parser.add_argument('--stream', action='store_true',
+                        help="low-memory mode: read, map and write the source in row chunks")
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS,
+                        help=f"rows per chunk with --stream (default: {DEFAULT_CHUNK_ROWS})")
+    parser.add_argument('--reject-invalid', action='store_true',
+                        help="do not write the ASN for a source that fails validation (see its _validation.csv)")
+    parser.add_argument('--jobs', type=int, default=None,
+                        help="worker processes for multiple sources (default: one per CPU core)")
+    parser.add_argument('--summary', default=None, help="write the JSON summary to this file instead of stdout")
+    parser.add_argument('--run-log', default=None, metavar='FILE',
+                        help="append one JSON line per source file (timings, memory, counts) to FILE")
+    parser.add_argument('--no-lookup-cache', action='store_true',
+                        help="always parse lookup files instead of using the on-disk lookup cache")
+    parser.add_argument('--clear-lookup-cache', action='store_true',
+                        help="delete the on-disk lookup cache and exit")
+    args = parser.parse_args(argv)
+    
+    if args.clear_lookup_cache:
+        print(json.dumps({'ok': True, 'removed': LookupCache().clear()}))
+        return 0
+    if not args.profile or not args.sources:
+        parser.error("--profile and at least one source are required")
+    if args.stream and (args.split_by or args.format == 'parquet'):
+        parser.error("--stream writes a single .xlsx or .csv file (no --split-by or parquet)")
+    try:
+        if args.split_by:
+            check_split_column(args.split_by)
+    except ValueError as e:
+        parser.error(str(e))
+
+    try:
+        lookup_args = parse_lookup_args(args.lookup)
+        mappings, lookup_paths = load_profile(args.profile)
+    except (argparse.ArgumentTypeError, OSError, ValueError) as e:
+        parser.error(str(e))
+    lookup_paths.update(lookup_args)
+    startup_seconds = time.perf_counter() - _START
+
+    report = {'ok': True, 'startup_seconds': round(startup_seconds, 3), 'lookup_files': {}}
+
+    # Lookups are loaded once and their indexes shared by every source file
+    cache = None if args.no_lookup_cache else LookupCache()
+    lookup_files, report['lookup_files'] = load_lookup_files(lookup_paths, mappings, cache)
+    if any(entry['status'] != 'ok' for entry in report['lookup_files'].values()):
+        report['ok'] = False
+
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    batch_report = run_batch(expand_sources(args.sources), mappings, lookup_files,
+                             output_dir=args.output_dir,
+                             output_format=args.format,
+                             split_column=args.split_by,
+                             chunk_rows=args.chunk_rows if args.stream else None,
+                             max_workers=args.jobs,
+                             run_log=args.run_log,
+                             reject_invalid=args.reject_invalid)
+    report.update(batch_report)
+    report['batch_seconds'] = batch_report['total_seconds']
+    if batch_report['failed']:
+        report['ok'] = False
+
+    report['total_seconds'] = round(time.perf_counter() - _START, 3)
+
+    summary = json.dumps(report, indent=2, default=str)
+    if args.summary:
+        with open(args.summary, 'w', encoding='utf-8') as f:
+            f.write(summary)
+    else:
+        print(summary)
+    return 0 if report['ok'] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,2367 @@
+"""UI-free ASN mapping engine shared by the Tk app (script.py) and the CLI (asn_cli.py)
+
+Mapping configuration is plain data so it can be saved, loaded and run
+without any widgets:
+
+    mappings = {
+        "Item:": {"type": "Direct", "source_column": "SKU"},
+        "LOTTABLE01": {"type": "Multi-Select", "selections": ["Batch", "Lot"]},
+        "Owner": {"type": "Lookup", "lookup_config": {
+            "lookup_file": "owners", "source_column": "Supplier",
+            "lookup_key": "Code", "lookup_value": "Owner",
+            "normalize": ["text", "strip"], "match": "exact"}},   # both optional
+        "LOTTABLE03": {"type": "Lookup", "lookup_config": {
+            "lookup_file": "items", "source_column": ["Owner", "SKU"],   # composite key
+            "lookup_key": ["StorerKey", "Item"], "lookup_value": "SkuGroup",
+            "chain": [{"lookup_file": "groups", "lookup_key": "SkuGroup",
+                       "lookup_value": "HoldCode"}]}},   # then look the value up again
+        "Hold Code:": {"type": "Manual Input", "value": "OK"},
+    }
+
+compile_plan() turns this into a MappingPlan of per-column operations
+checked against the source header; MappingPlan.execute() runs it on a
+DataFrame. Nothing in this module may import tkinter.
+"""
+import pandas as pd
+import numpy as np
+import os
+import re
+import csv
+import copy
+import glob
+import json
+import hashlib
+import difflib
+import importlib.util
+import threading
+import time
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from functools import lru_cache
+
+# ASN Template columns with their mapping requirements (1=required, 0=optional/hidden)
+ASN_TEMPLATE = {
+    "Messages": 0,
+    "GenericKey": 1,
+    "HIDDEN ASN/Receipt:": 0,
+    "Item:": 1,
+    "Owner": 1,
+    "Line #:": 0,
+    "Expected Qty:": 1,
+    "Received Qty:": 0,
+    "UOM:": 0,
+    "Pack:": 0,
+    "LPN:": 1,
+    "Location:": 1,
+    "Purchase Order": 0,
+    "Hold Code:": 1,
+    "HIDDEN Status:": 0,
+    "LOTTABLE01": 1,
+    "LOTTABLE02": 1,
+    "LOTTABLE03": 1,
+    "LOTTABLE04": 0,
+    "LOTTABLE05": 0,
+    "LOTTABLE06": 1,
+    "LOTTABLE07": 1,
+    "LOTTABLE08": 0,
+    "LOTTABLE09": 1,
+    "LOTTABLE10": 0,
+    "LOTTABLE11": 0,
+    "LOTTABLE12": 0,
+    "Container Reference:": 0,
+    "CUBE": 0,
+    "Gross Weight:": 0,
+    "Net Weight:": 0,
+    "Tare Weight:": 0,
+    "Temperature": 0,
+    "Received Date:": 0,
+    "DISPOSITIONCODE": 0,
+    "DISPOSITIONTYPE": 0,
+    "Transaction Override Date:": 0,
+    "Extended Price:": 0,
+    "EXTERNALLOT": 0,
+    "External Line #:": 0,
+    "External ASN #:": 0,
+    "ID": 0,
+    "MatchLottable": 0,
+    "Notes:": 0,
+    "Packing:": 0,
+    "POLINENUMBER": 0,
+    "QC Auto Adjust:": 0,
+    "Inspected:": 0,
+    "Rejected:": 0,
+    "Reject Reason:": 0,
+    "QC Required:": 0,
+    "QC Status:": 0,
+    "QCUSER": 0,
+    "QTYADJUSTED": 0,
+    "QTYREJECTED": 0,
+    "Reason Code:": 0,
+    "RETURNCONDITION": 0,
+    "RETURNREASON": 0,
+    "RETURNTYPE": 0,
+    "RMA Number:": 0,
+    "SupplierKey": 0,
+    "Ship From Name": 0,
+    "UDF1:": 1,
+    "UDF2:": 1,
+    "UDF3:": 1,
+    "UDF4:": 1,
+    "UDF5:": 0
+}
+
+MULTI_SELECT_COLUMNS = [
+    "LOTTABLE01", "LOTTABLE02", "LOTTABLE03", "LOTTABLE04", "LOTTABLE05",
+    "LOTTABLE06", "LOTTABLE07", "LOTTABLE08", "LOTTABLE09", "LOTTABLE10",
+    "LOTTABLE11", "LOTTABLE12", "UDF1:", "UDF2:", "UDF3:", "UDF4:", "UDF5:"
+]
+
+BLANK_OPTION = "-- Leave Blank --"
+
+# Rows per chunk in streaming mode
+DEFAULT_CHUNK_ROWS = 50000
+
+# Source files picked up from folders in batch mode
+SOURCE_EXTENSIONS = ('.xlsx', '.xls', '.xlsb', '.csv')
+
+# Output file formats, and the ASN columns output can be split on
+OUTPUT_FORMATS = ['xlsx', 'csv', 'parquet']
+SPLIT_COLUMNS = ['GenericKey', 'External ASN #:']
+
+# ASN columns validated as numbers (no negatives), and those that must also be above zero
+NUMERIC_COLUMNS = ['Expected Qty:', 'Received Qty:', 'CUBE', 'Gross Weight:', 'Net Weight:',
+                   'Tare Weight:', 'Extended Price:']
+POSITIVE_COLUMNS = ['Expected Qty:']
+
+# Saved mapping profiles, matched against new sources by header signature
+PROFILE_DIR = os.path.join(os.path.expanduser('~'), '.asn_remapper', 'profiles')
+
+# Lookup columns and key indexes persisted across sessions
+LOOKUP_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.asn_remapper', 'lookup_cache')
+LOOKUP_CACHE_MAX_BYTES = 512 * 1024 ** 2
+
+# JSON-lines log of generation runs (timings, memory, counts) for trend analysis
+RUN_LOG_PATH = os.path.join(os.path.expanduser('~'), '.asn_remapper', 'run_log.jsonl')
+
+
+# Lookup key normalization steps and match modes (see normalize_keys, LookupIndex)
+NORMALIZE_STEPS = ['text', 'strip', 'casefold', 'leading_zeros']
+MATCH_MODES = ['exact', 'prefix', 'fuzzy']
+DEFAULT_FUZZY_CUTOFF = 0.9
+
+try:
+    from rapidfuzz import fuzz as _rapidfuzz_fuzz, process as _rapidfuzz_process
+except ImportError:
+    _rapidfuzz_process = None
+
+try:
+    import psutil as _psutil
+except ImportError:
+    _psutil = None
+
+
+class GenerationCancelled(Exception):
+    """Raised from a progress callback to abort a generation"""
+
+# Tokens dropped when combining Multi-Select columns
+NULL_TOKENS = ['', 'nan', 'None', 'NaN']
+
+_to_str = np.frompyfunc(str, 1, 1)
+
+# pd.read_csv's default NA markers, so other CSV engines read the same NaNs
+CSV_NA_VALUES = ['', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+                 '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null']
+
+
+def combine_columns(source_df, columns, separator="|"):
+    """Combine source columns row-wise with separator, skipping empty/null values"""
+    combined = np.full(len(source_df), "", dtype=object)
+    has_value = np.zeros(len(source_df), dtype=bool)
+    
+    for source_col in columns:
+        if source_col not in source_df.columns:
+            continue
+        
+        # str() every cell in one pass, then mask out null tokens
+        tokens = _to_str(source_df[source_col].to_numpy(dtype=object))
+        present = ~pd.Series(tokens, dtype=object).isin(NULL_TOKENS).to_numpy()
+        
+        append = present & has_value
+        combined[append] = combined[append] + separator + tokens[append]
+        first = present & ~has_value
+        combined[first] = tokens[first]
+        has_value |= present
+    
+    return combined
+
+
+def constant_column(value, length, codes=None):
+    """A column repeating one value, stored as a single-category Categorical
+    
+    Costs one byte per row instead of a pointer per row; it expands to plain
+    values only when written out. codes (int8 zeros of length) can be shared
+    between constant columns of the same frame.
+    """
+    if codes is None:
+        codes = np.zeros(length, dtype=np.int8)
+    return pd.Categorical.from_codes(codes, categories=[value])
+
+
+def _windows_working_set():
+    import ctypes
+    from ctypes import wintypes
+    
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD)] + \
+                   [(name, ctypes.c_size_t) for name in (
+                       'PeakWorkingSetSize', 'WorkingSetSize', 'QuotaPeakPagedPoolUsage', 'QuotaPagedPoolUsage',
+                       'QuotaPeakNonPagedPoolUsage', 'QuotaNonPagedPoolUsage', 'PagefileUsage', 'PeakPagefileUsage')]
+    
+    counters = PROCESS_MEMORY_COUNTERS()
+    counters.cb = ctypes.sizeof(counters)
+    kernel32 = ctypes.windll.kernel32
+    kernel32.GetCurrentProcess.restype = wintypes.HANDLE
+    if not kernel32.K32GetProcessMemoryInfo(kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb):
+        return None
+    return counters.WorkingSetSize
+
+
+def process_memory_bytes():
+    """Resident memory of this process in bytes, or None where it cannot be read
+    
+    Uses psutil when installed, otherwise /proc (Linux) or the Win32 API.
+    """
+    if _psutil is not None:
+        return _psutil.Process().memory_info().rss
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    if os.name == 'nt':
+        try:
+            return _windows_working_set()
+        except (OSError, AttributeError):
+            return None
+    return None
+
+
+class RunProfiler:
+    """Wall time, rows/sec and peak memory per phase and per ASN column of a run
+    
+    Wrap work in measure(phase, column=...) and set 'rows' on the yielded
+    dict for rows/sec. Memory is the process's resident size, sampled on
+    entering and leaving each measure() and every sample_seconds on a
+    background thread while the profiler is started (use it as a context
+    manager). tracemalloc would give exact allocations but slows mapping
+    about tenfold.
+    """
+    
+    def __init__(self, sample_seconds=0.05):
+        self.sample_seconds = sample_seconds
+        self.phases = {}  # phase -> {'seconds', 'rows'}
+        self.columns = {}  # ASN column (or columns sharing a lookup) -> {'seconds', 'rows'}
+        self._peaks = {}  # ('phase' | 'column', name) -> peak bytes
+        self._current = (None, None)  # (phase, column) being measured
+        self._start_bytes = process_memory_bytes()
+        self._peak_bytes = self._start_bytes
+        self._started = time.perf_counter()
+        self._stop_event = threading.Event()
+        self._thread = None
+    
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._sample_loop, daemon=True)
+        self._thread.start()
+        return self
+    
+    def __exit__(self, *exc_info):
+        self._stop_event.set()
+        self._thread.join()
+        self._sample()
+    
+    def _sample_loop(self):
+        while not self._stop_event.wait(self.sample_seconds):
+            self._sample()
+    
+    def _sample(self):
+        memory_bytes = process_memory_bytes()
+        if memory_bytes is None:
+            return
+        self._peak_bytes = max(self._peak_bytes or 0, memory_bytes)
+        phase, column = self._current
+        for key in (('phase', phase), ('column', column)):
+            if key[1] is not None and memory_bytes > self._peaks.get(key, 0):
+                self._peaks[key] = memory_bytes
+    
+    @contextmanager
+    def measure(self, phase=None, column=None):
+        """Time the block under phase and/or column; set 'rows' on the yielded dict for rows/sec"""
+        block = {'rows': 0}
+        outer = self._current
+        self._current = (phase or outer[0], column or outer[1])
+        self._sample()
+        start = time.perf_counter()
+        try:
+            yield block
+        finally:
+            seconds = time.perf_counter() - start
+            self._sample()
+            self._current = outer
+            for measured, name in ((self.phases, phase), (self.columns, column)):
+                if name:
+                    entry = measured.setdefault(name, {'seconds': 0.0, 'rows': 0})
+                    entry['seconds'] += seconds
+                    entry['rows'] += block['rows']
+    
+    def report(self):
+        """Timings and memory as a JSON-ready dict (memory in MB, None if unavailable)"""
+        def megabytes(memory_bytes):
+            return round(memory_bytes / 1024 ** 2, 1) if memory_bytes is not None else None
+        
+        def entries(measured, kind):
+            return {name: {'seconds': round(entry['seconds'], 4),
+                           'rows_per_second': round(entry['rows'] / entry['seconds'])
+                           if entry['rows'] and entry['seconds'] else None,
+                           'peak_memory_mb': megabytes(self._peaks.get((kind, name)))}
+                    for name, entry in measured.items()}
+        
+        columns = sorted(self.columns.items(), key=lambda item: -item[1]['seconds'])
+        return {
+            'total_seconds': round(time.perf_counter() - self._started, 3),
+            'start_memory_mb': megabytes(self._start_bytes),
+            'peak_memory_mb': megabytes(self._peak_bytes),
+            'phases': entries(self.phases, 'phase'),
+            'columns': entries(dict(columns), 'column'),
+        }
+
+
+def _measure(profiler, phase=None, column=None):
+    """profiler.measure(), or a no-op block yielding a throwaway dict when profiler is None"""
+    if profiler is None:
+        return nullcontext({'rows': 0})
+    return profiler.measure(phase, column)
+
+
+def append_run_log(log_path, record):
+    """Append record (plus the current time) to a JSON-lines run log"""
+    os.makedirs(os.path.dirname(os.path.abspath(log_path)), exist_ok=True)
+    with open(log_path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(dict(record, time=datetime.now().isoformat(timespec='seconds')), default=str) + "\n")
+
+
+class SourceCache:
+    """LRU cache of parsed source DataFrames keyed by path + mtime + size
+    
+    Entries are evicted oldest-first once the in-memory total exceeds max_bytes.
+    If spill_dir is set (and pyarrow is installed) evicted frames are written to
+    Parquet sidecars there, which load much faster than re-parsing Excel.
+    Frames may hold only some of the file's columns (see get()); only whole
+    frames are spilled. Cached frames are shared - callers must treat them
+    as read-only. One cache can be used from several threads (the GUI and
+    its generation worker): the bookkeeping is locked, but files are parsed
+    outside the lock, so two threads may now and then parse the same file.
+    """
+    
+    def __init__(self, max_bytes=1024 ** 3, spill_dir=None):
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir
+        self.total_bytes = 0
+        self._entries = OrderedDict()  # key -> (df, nbytes, loaded columns or None for all)
+        self._headers = {}  # key -> column names
+        self._lock = threading.Lock()
+    
+    def _key(self, file_path):
+        stat = os.stat(file_path)
+        return (os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size)
+    
+    def _sidecar_path(self, key):
+        digest = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.spill_dir, f"{os.path.basename(key[0])}.{digest}.parquet")
+    
+    def header(self, file_path, probe):
+        """Return the column names of file_path, calling probe(file_path) once per file version"""
+        key = self._key(file_path)
+        with self._lock:
+            if key in self._headers:
+                return self._headers[key]
+        columns = list(probe(file_path))
+        with self._lock:
+            self._drop_stale(key)
+            self._headers[key] = columns
+        return columns
+    
+    def get(self, file_path, loader, columns=None):
+        """Return the parsed DataFrame for file_path, calling loader(file_path) on a miss
+        
+        With columns only those are needed: a cached frame that already has
+        them is returned as is, otherwise loader(file_path, usecols=...) reads
+        them together with the columns cached so far. The frame may hold
+        more columns than asked for.
+        """
+        key = self._key(file_path)
+        usecols = columns
+        
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                df, nbytes, cached_columns = entry
+                if cached_columns is None or (columns is not None and set(columns) <= set(cached_columns)):
+                    self._entries.move_to_end(key)
+                    return df
+                if columns is not None:
+                    usecols = list(dict.fromkeys(list(cached_columns) + list(columns)))
+                self._discard(key)
+            else:
+                # The file changed on disk - drop whatever we held for the old version
+                self._drop_stale(key)
+        
+        df = None
+        if self.spill_dir and os.path.exists(self._sidecar_path(key)):
+            try:
+                df = pd.read_parquet(self._sidecar_path(key))
+                usecols = None
+            except Exception:
+                df = None
+        if df is None:
+            df = loader(file_path) if usecols is None else loader(file_path, usecols=usecols)
+        
+        with self._lock:
+            if key in self._entries:
+                # Loaded by another thread meanwhile
+                self._discard(key)
+            self._store(key, df, usecols)
+        return df
+    
+    def _drop_stale(self, key):
+        for stale_key in [k for k in self._entries if k[0] == key[0] and k != key]:
+            self._discard(stale_key)
+        for stale_key in [k for k in self._headers if k[0] == key[0] and k != key]:
+            del self._headers[stale_key]
+    
+    def _store(self, key, df, columns=None):
+        if columns is None:
+            self._headers[key] = list(df.columns)
+        nbytes = int(df.memory_usage(index=True, deep=True).sum())
+        if nbytes > self.max_bytes:
+            self._spill(key, df, columns)
+            return
+        
+        self._entries[key] = (df, nbytes, columns)
+        self.total_bytes += nbytes
+        while self.total_bytes > self.max_bytes:
+            oldest_key = next(iter(self._entries))
+            oldest_df, oldest_nbytes, oldest_columns = self._entries[oldest_key]
+            self._spill(oldest_key, oldest_df, oldest_columns)
+            self._discard(oldest_key)
+    
+    def _discard(self, key):
+        df, nbytes, columns = self._entries.pop(key)
+        self.total_bytes -= nbytes
+    
+    def _spill(self, key, df, columns=None):
+        if not self.spill_dir or columns is not None:
+            return
+        sidecar = self._sidecar_path(key)
+        if os.path.exists(sidecar):
+            return
+        try:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            df.to_parquet(sidecar, index=False)
+        except Exception:
+            # pyarrow missing or mixed-type object columns - just don't spill
+            if os.path.exists(sidecar):
+                os.remove(sidecar)
+    
+    def clear(self):
+        """Drop all in-memory entries and spilled sidecars"""
+        with self._lock:
+            self._entries.clear()
+            self._headers.clear()
+            self.total_bytes = 0
+        if self.spill_dir and os.path.isdir(self.spill_dir):
+            for name in os.listdir(self.spill_dir):
+                if name.endswith('.parquet'):
+                    os.remove(os.path.join(self.spill_dir, name))
+
+
+class LookupCache:
+    """On-disk cache of lookup file columns and key indexes across sessions
+    
+    Each loaded column is stored as a Parquet file, each key index (the row
+    of every unique key) as a .npy file and the header row as JSON, keyed by
+    the lookup file's path,
+    mtime and size plus the column name. Editing the lookup file invalidates
+    its entries. The least recently used entries are deleted once the cache
+    directory exceeds max_bytes. Needs pyarrow for the Parquet files; without
+    it (or for mixed-type columns) columns are simply not cached.
+    """
+    
+    def __init__(self, cache_dir=LOOKUP_CACHE_DIR, max_bytes=LOOKUP_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+    
+    def _file_tag(self, file_path):
+        return hashlib.sha1(os.path.abspath(file_path).encode('utf-8')).hexdigest()[:12]
+    
+    def _entry_path(self, file_path, column, kind):
+        stat = os.stat(file_path)
+        version = hashlib.sha1(repr((stat.st_mtime_ns, stat.st_size)).encode('utf-8')).hexdigest()[:8]
+        column_tag = hashlib.sha1(repr((kind, column)).encode('utf-8')).hexdigest()[:12]
+        ext = {'column': 'parquet', 'index': 'npy', 'header': 'json'}[kind]
+        return os.path.join(self.cache_dir, f"{self._file_tag(file_path)}_{version}_{column_tag}.{ext}")
+    
+    def _entries(self):
+        if not os.path.isdir(self.cache_dir):
+            return []
+        return [entry for entry in os.scandir(self.cache_dir)
+                if entry.is_file() and entry.name.endswith(('.parquet', '.npy', '.json'))
+                and '.partial.' not in entry.name]
+    
+    def _hit(self, entry_path):
+        # Mark as recently used for eviction
+        os.utime(entry_path)
+        return entry_path
+    
+    def load_columns(self, file_path, columns):
+        """DataFrame of the given columns if every one of them is cached, else None"""
+        try:
+            entry_paths = [self._entry_path(file_path, col, 'column') for col in columns]
+            if not all(os.path.exists(entry_path) for entry_path in entry_paths):
+                return None
+            return pd.DataFrame({col: pd.read_parquet(self._hit(entry_path))['values']
+                                 for col, entry_path in zip(columns, entry_paths)})
+        except Exception:
+            return None
+    
+    def store_columns(self, file_path, df):
+        """Cache every column of df (parsed from file_path)"""
+        for col in df.columns:
+            try:
+                self._write(self._entry_path(file_path, col, 'column'),
+                            lambda path: pd.DataFrame({'values': df[col]}).to_parquet(path, index=False))
+            except Exception:
+                continue  # pyarrow missing or mixed-type column - leave it uncached
+        self._prune(file_path)
+    
+    def load_header(self, file_path):
+        """Cached column names of file_path, or None"""
+        try:
+            entry_path = self._entry_path(file_path, None, 'header')
+            if not os.path.exists(entry_path):
+                return None
+            with open(self._hit(entry_path), encoding='utf-8') as f:
+                return json.load(f)
+        except Exception:
+            return None
+    
+    def store_header(self, file_path, columns):
+        """Cache the column names of file_path (only if they survive a JSON round trip)"""
+        columns = list(columns)
+        if not all(isinstance(col, str) for col in columns):
+            return
+        def write_header(path):
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(columns, f)
+        
+        try:
+            self._write(self._entry_path(file_path, None, 'header'), write_header)
+        except Exception:
+            return
+        self._prune(file_path)
+    
+    def load_rows(self, file_path, key_column):
+        """Cached unique-key rows of a LookupIndex, or None"""
+        try:
+            entry_path = self._entry_path(file_path, key_column, 'index')
+            if not os.path.exists(entry_path):
+                return None
+            return np.load(self._hit(entry_path))
+        except Exception:
+            return None
+    
+    def store_rows(self, file_path, key_column, rows):
+        """Cache the unique-key rows of a LookupIndex"""
+        try:
+            self._write(self._entry_path(file_path, key_column, 'index'),
+                        lambda path: np.save(path, rows))
+        except Exception:
+            return
+        self._prune(file_path)
+    
+    def _write(self, entry_path, writer):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with partial_output(entry_path) as partial_path:
+            writer(partial_path)
+    
+    def _prune(self, file_path=None):
+        """Drop entries of older versions of file_path, then the least recently used over max_bytes"""
+        entries = self._entries()
+        if file_path is not None:
+            try:
+                current = os.path.basename(self._entry_path(file_path, None, 'column')).split('_')[1]
+            except OSError:
+                current = None
+            prefix = self._file_tag(file_path) + '_'
+            for entry in [entry for entry in entries
+                          if entry.name.startswith(prefix) and entry.name.split('_')[1] != current]:
+                os.remove(entry.path)
+                entries.remove(entry)
+        
+        total_bytes = sum(entry.stat().st_size for entry in entries)
+        for entry in sorted(entries, key=lambda entry: entry.stat().st_mtime):
+            if total_bytes <= self.max_bytes:
+                break
+            total_bytes -= entry.stat().st_size
+            os.remove(entry.path)
+    
+    def stats(self):
+        """(entry count, total bytes) of the cache directory"""
+        entries = self._entries()
+        return len(entries), sum(entry.stat().st_size for entry in entries)
+    
+    def clear(self, file_path=None):
+        """Delete the cached entries of file_path (all entries if None), returns how many"""
+        prefix = self._file_tag(file_path) + '_' if file_path else ''
+        removed = 0
+        for entry in self._entries():
+            if entry.name.startswith(prefix):
+                os.remove(entry.path)
+                removed += 1
+        return removed
+
+
+def normalize_keys(values, steps):
+    """Normalize lookup keys for matching, vectorized; nulls stay null
+    
+    Any step first converts keys to text, with integral numbers written
+    without a decimal part (1001, 1001.0 and "1001" all become "1001").
+    'strip' trims whitespace, 'casefold' ignores case and 'leading_zeros'
+    drops leading zeros (so zero-padded codes match unpadded ones).
+    """
+    values = pd.Series(values)
+    if not steps:
+        return values.to_numpy()
+    unknown = [step for step in steps if step not in NORMALIZE_STEPS]
+    if unknown:
+        raise ValueError(f"Unknown key normalization: {', '.join(unknown)}")
+    
+    notna = values.notna().to_numpy()
+    text = np.full(len(values), np.nan, dtype=object)
+    text[notna] = _to_str(values.to_numpy(dtype=object)[notna])
+    text = pd.Series(text, dtype=object)
+    text = text.str.replace(r'^(-?\d+)\.0*$', r'\1', regex=True)
+    if 'strip' in steps:
+        text = text.str.strip()
+    if 'casefold' in steps:
+        text = text.str.casefold()
+    if 'leading_zeros' in steps:
+        text = text.str.replace(r'^(-?)0+(?=.)', r'\1', regex=True)
+    return text.to_numpy(dtype=object)
+
+
+class LookupIndex:
+    """Unique-key index over one lookup key column, shared by every value column
+    
+    Matches dict(zip(keys, values)) semantics (the last duplicate key wins) but
+    resolves source values with a single vectorized get_indexer call. Keys
+    (and source values) are passed through normalize_keys(normalize) first.
+    A tuple of key columns builds a composite (MultiIndex) key, matched
+    against a DataFrame with one source column per key column.
+    """
+    
+    def __init__(self, lookup_df, key_column, rows=None, normalize=()):
+        start = time.perf_counter()
+        self.lookup_df = lookup_df
+        self.key_column = key_column
+        self.normalize = tuple(normalize)
+        if isinstance(key_column, tuple):
+            keys = pd.MultiIndex.from_arrays([self._key_array(lookup_df[col]) for col in key_column])
+        else:
+            keys = pd.Index(self._key_array(lookup_df[key_column]))
+        if rows is None:
+            rows = np.flatnonzero(~keys.duplicated(keep='last'))
+        # else: unique-key rows from a LookupCache, skips the duplicate scan
+        self.keys = keys.take(rows)
+        self.rows = rows
+        self.value_arrays = {}
+        self._keys_by_length = None  # Prefix matching, built on first use
+        self._fuzzy_choices = None  # Fuzzy matching, built on first use
+        self.nbytes = int(self.keys.memory_usage(deep=True)) + self.rows.nbytes
+        self.build_seconds = time.perf_counter() - start
+    
+    def _key_array(self, values):
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            # Compact storage - index the plain key values
+            values = values.to_numpy()
+        if self.normalize:
+            codes, uniques = pd.factorize(pd.Series(values), use_na_sentinel=False)
+            values = normalize_keys(uniques, self.normalize)[codes]
+        return values
+    
+    def values(self, value_column):
+        """Values of value_column aligned with the unique keys (built once)"""
+        if value_column not in self.value_arrays:
+            start = time.perf_counter()
+            values = self.lookup_df[value_column].to_numpy()[self.rows]
+            self.value_arrays[value_column] = values
+            self.nbytes += int(pd.Series(values).memory_usage(index=False, deep=True))
+            self.build_seconds += time.perf_counter() - start
+        return self.value_arrays[value_column]
+    
+    def positions(self, source_values, match='exact', fuzzy_cutoff=DEFAULT_FUZZY_CUTOFF):
+        """Row of each source value in the index, -1 where there is no match
+        
+        Values without an exact (normalized) match fall back to the longest
+        key that is a prefix of the value with match='prefix', or to the most
+        similar key scoring at least fuzzy_cutoff (0-1) with match='fuzzy'.
+        """
+        if isinstance(source_values, pd.DataFrame):
+            # Composite key - one source column per key column
+            if match != 'exact':
+                raise ValueError("Prefix and fuzzy matching need a single key column")
+            arrays = []
+            for col in source_values.columns:
+                if self.normalize:
+                    # Normalize each distinct value once
+                    col_codes, col_uniques = pd.factorize(source_values[col], use_na_sentinel=False)
+                    arrays.append(normalize_keys(col_uniques, self.normalize)[col_codes])
+                else:
+                    arrays.append(source_values[col])
+            source_keys = pd.MultiIndex.from_arrays(arrays)
+            codes, uniques = source_keys.factorize()
+            return self.keys.get_indexer(uniques)[codes]
+        
+        # Hash each distinct source value once, then broadcast back to the rows
+        codes, uniques = pd.factorize(pd.Series(source_values), use_na_sentinel=False)
+        if self.normalize:
+            uniques = normalize_keys(uniques, self.normalize)
+        unique_positions = self.keys.get_indexer(uniques)
+        
+        if match != 'exact':
+            missing = np.flatnonzero((unique_positions < 0) & pd.notna(uniques))
+            if len(missing):
+                missing_text = pd.Series(_to_str(np.asarray(uniques, dtype=object)[missing]), dtype=object)
+                if match == 'prefix':
+                    unique_positions[missing] = self._prefix_positions(missing_text)
+                elif match == 'fuzzy':
+                    unique_positions[missing] = self._fuzzy_positions(missing_text, fuzzy_cutoff)
+                else:
+                    raise ValueError(f"Unknown match mode: {match}")
+        return unique_positions[codes]
+    
+    def _prefix_positions(self, values):
+        """Longest key that is a prefix of each value (one get_indexer per key length)"""
+        if self._keys_by_length is None:
+            text_keys = pd.Series(_to_str(self.keys.to_numpy(dtype=object)), dtype=object)
+            text_keys[self.keys.isna()] = np.nan
+            lengths = text_keys.str.len()
+            self._keys_by_length = []
+            for length in sorted(lengths.dropna().unique(), reverse=True):
+                if length > 0:
+                    selected = np.flatnonzero((lengths == length).to_numpy())
+                    self._keys_by_length.append(
+                        (int(length), pd.Index(text_keys.iloc[selected].to_numpy()), selected))
+        
+        positions = np.full(len(values), -1, dtype=np.intp)
+        value_lengths = values.str.len().to_numpy()
+        for length, keys, selected in self._keys_by_length:
+            todo = np.flatnonzero((positions < 0) & (value_lengths >= length))
+            if not len(todo):
+                continue
+            found = keys.get_indexer(values.iloc[todo].str[:length].to_numpy())
+            positions[todo[found >= 0]] = selected[found[found >= 0]]
+        return positions
+    
+    def _fuzzy_positions(self, values, cutoff):
+        """Most similar key for each value, -1 below cutoff (rapidfuzz if installed, else difflib)
+        
+        Every value is compared with many keys, so this is meant for the few
+        values left over by an exact match. rapidfuzz scores all keys in C.
+        The difflib fallback loops over keys in Python, so it only compares
+        keys that share the value's first character; a typo in that
+        character is never matched.
+        """
+        if self._fuzzy_choices is None:
+            text_keys = [str(key) for key in self.keys]
+            # difflib fallback only compares keys sharing the first character
+            by_first = {}
+            for position, key in enumerate(text_keys):
+                by_first.setdefault(key[:1], {}).setdefault(key, position)
+            self._fuzzy_choices = (text_keys, by_first)
+        text_keys, by_first = self._fuzzy_choices
+        
+        positions = np.full(len(values), -1, dtype=np.intp)
+        for value_number, value in enumerate(values):
+            if _rapidfuzz_process is not None:
+                best = _rapidfuzz_process.extractOne(value, text_keys, scorer=_rapidfuzz_fuzz.ratio,
+                                                     score_cutoff=cutoff * 100)
+                if best is not None:
+                    positions[value_number] = best[2]
+                continue
+            candidates = by_first.get(value[:1], {})
+            matches = difflib.get_close_matches(value, candidates, n=1, cutoff=cutoff)
+            if matches:
+                positions[value_number] = candidates[matches[0]]
+        return positions
+    
+    def lookup(self, source_values, value_column, positions=None):
+        """Map source values to value_column, unmatched/empty values become ''"""
+        if positions is None:
+            positions = self.positions(source_values)
+        result = pd.api.extensions.take(self.values(value_column), positions, allow_fill=True)
+        return pd.Series(result).fillna('').values
+
+
+def sniff_format(file_path):
+    """Return 'xlsx', 'xlsb', 'xls', 'ods' or 'csv' from the file's leading bytes
+    
+    The extension is not trusted - exports are often mislabelled (an .xls
+    that is really CSV text, a workbook renamed to .csv). Zip containers are
+    told apart by their workbook part; anything else is read as CSV text.
+    """
+    with open(file_path, 'rb') as f:
+        magic = f.read(8)
+    
+    if magic.startswith(b'PK\x03\x04'):
+        with zipfile.ZipFile(file_path) as archive:
+            names = archive.namelist()
+        if any(name.endswith('workbook.bin') for name in names):
+            return 'xlsb'
+        if any(name.endswith('workbook.xml') for name in names):
+            return 'xlsx'
+        if 'content.xml' in names:
+            return 'ods'
+        raise ValueError(f"{os.path.basename(file_path)} is a zip archive but not a spreadsheet")
+    if magic == b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1':
+        # OLE2 compound document - legacy .xls
+        return 'xls'
+    return 'csv'
+
+
+def _read_csv_pandas(file_path, nrows=None, usecols=None):
+    # round_trip parses floats exactly, as pyarrow does, rather than off in the last digit
+    return pd.read_csv(file_path, nrows=nrows, usecols=usecols, float_precision='round_trip')
+
+
+def _read_csv_pyarrow(file_path, nrows=None, usecols=None):
+    """pyarrow's multi-threaded CSV reader, converted to match pd.read_csv
+    
+    Dates stay text, pandas' NA markers become NaN and empty columns are
+    float64, as with pandas. Header probes (nrows), files pyarrow rejects
+    (ragged rows) and integers out of int64 range (which pyarrow would
+    read as floats, losing digits of LPNs and serials) are read by pandas.
+    """
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv
+    
+    header = list(pd.read_csv(file_path, nrows=0).columns)  # Deduplicated like pandas ('A', 'A.1')
+    if nrows is not None or (usecols is not None and not set(usecols) <= set(header)):
+        return _read_csv_pandas(file_path, nrows, usecols)
+    include_columns = [col for col in header if usecols is None or col in set(usecols)]
+    
+    def read(column_types):
+        convert_options = pa_csv.ConvertOptions(column_types=column_types, include_columns=include_columns,
+                                                null_values=CSV_NA_VALUES, strings_can_be_null=True)
+        return pa_csv.read_csv(file_path, pa_csv.ReadOptions(column_names=header, skip_rows=1),
+                               convert_options=convert_options)
+    
+    try:
+        table = read({})
+        # pd.read_csv leaves dates as text; read those columns again as strings
+        temporal = {field.name: pa.string() for field in table.schema if pa.types.is_temporal(field.type)}
+        if temporal:
+            table = read(temporal)
+    except pa.ArrowInvalid:
+        return _read_csv_pandas(file_path, nrows, usecols)
+    
+    df = table.to_pandas()
+    for field in table.schema:
+        if pa.types.is_floating(field.type) and (df[field.name].abs() >= 2 ** 63).any():
+            return _read_csv_pandas(file_path, nrows, usecols)
+        if pa.types.is_null(field.type):
+            df[field.name] = df[field.name].astype('float64')
+    for col in df.columns[df.dtypes == object]:
+        # e.g. booleans with blanks come back with None where pandas has NaN
+        df[col] = df[col].where(df[col].notna(), np.nan)
+    return df
+
+
+def _read_excel_with(engine):
+    """Reader that hands the file to pd.read_excel with the given engine"""
+    def read(file_path, nrows=None, usecols=None):
+        return pd.read_excel(file_path, engine=engine, nrows=nrows, usecols=usecols)
+    return read
+
+
+def _read_excel_rows(file_format, engine):
+    """Reader that streams rows itself when only some columns are wanted
+    
+    read_excel converts every cell before dropping columns, so column
+    subsets are parsed from the raw rows instead (see _parse_row_chunks).
+    """
+    read_excel = _read_excel_with(engine)
+    
+    def read(file_path, nrows=None, usecols=None):
+        if usecols is not None and nrows is None:
+            parse = lambda rows: _parse_row_chunks(rows, np.inf, usecols)
+            return next(_iter_excel_rows(file_path, parse, file_format))
+        # openpyxl is opened read-only and stops iterating rows after nrows
+        return read_excel(file_path, nrows, usecols)
+    return read
+
+
+def _read_excel_calamine(module, read_rows):
+    """calamine for whole sheets, read_rows for the first nrows rows when module is installed
+    
+    pandas' calamine reader loads the whole sheet range even for nrows=0,
+    so header probes would parse the full workbook; the row readers stop
+    after nrows rows.
+    """
+    read_calamine = _read_excel_with('calamine')
+    
+    def read(file_path, nrows=None, usecols=None):
+        if nrows is not None and _module_installed(module):
+            return read_rows(file_path, nrows, usecols)
+        return read_calamine(file_path, nrows, usecols)
+    return read
+
+
+_read_xlsx_rows = _read_excel_rows('xlsx', 'openpyxl')
+_read_xlsb_rows = _read_excel_rows('xlsb', 'pyxlsb')
+
+# Reader engines per sniffed file format, fastest first:
+# (engine name, module that must be installed or None, reader(file_path, nrows, usecols)).
+# load_dataframe() uses the first installed one; add more with register_reader_engine().
+READER_ENGINES = {
+    'csv': [('pyarrow', 'pyarrow', _read_csv_pyarrow),
+            ('pandas', None, _read_csv_pandas)],
+    'xlsx': [('calamine', 'python_calamine', _read_excel_calamine('openpyxl', _read_xlsx_rows)),
+             ('openpyxl', 'openpyxl', _read_xlsx_rows)],
+    'xlsb': [('calamine', 'python_calamine', _read_excel_calamine('pyxlsb', _read_xlsb_rows)),
+             ('pyxlsb', 'pyxlsb', _read_xlsb_rows)],
+    'xls': [('calamine', 'python_calamine', _read_excel_with('calamine')),
+            ('xlrd', 'xlrd', _read_excel_with('xlrd'))],
+    'ods': [('calamine', 'python_calamine', _read_excel_with('calamine')),
+            ('odf', 'odf', _read_excel_with('odf'))],
+}
+
+
+def register_reader_engine(file_format, name, reader, module=None, preferred=True):
+    """Add a reader engine for file_format, ahead of the existing ones when preferred"""
+    engines = [engine for engine in READER_ENGINES.setdefault(file_format, []) if engine[0] != name]
+    entry = (name, module, reader)
+    READER_ENGINES[file_format] = [entry] + engines if preferred else engines + [entry]
+
+
+@lru_cache(maxsize=None)
+def _module_installed(module):
+    return module is None or importlib.util.find_spec(module) is not None
+
+
+def reader_engines(file_format):
+    """Names of the installed reader engines for file_format, in preference order"""
+    return [name for name, module, reader in READER_ENGINES.get(file_format, []) if _module_installed(module)]
+
+
+def load_dataframe(file_path, nrows=None, usecols=None, engine=None):
+    """Load DataFrame from various file formats (only the first nrows rows / usecols columns if given)
+    
+    The format is sniffed from the file's content and read with the fastest
+    installed engine in READER_ENGINES, or with engine if named.
+    """
+    file_format = sniff_format(file_path)
+    for name, module, reader in READER_ENGINES.get(file_format, []):
+        if (engine is None and _module_installed(module)) or name == engine:
+            return reader(file_path, nrows=nrows, usecols=usecols)
+    
+    if engine is not None:
+        raise ValueError(f"No '{engine}' reader engine for {file_format} files")
+    raise ValueError(f"No reader engine installed for {file_format} files; "
+                     f"install one of: {', '.join(module for name, module, reader in READER_ENGINES.get(file_format, []) if module)}")
+
+
+def probe_columns(file_path, source_cache=None):
+    """Read only the header row of a file and return its column names"""
+    if source_cache is not None:
+        return source_cache.header(file_path, probe_columns)
+    return list(load_dataframe(file_path, nrows=0).columns)
+
+
+def compact_frame(df, max_category_ratio=0.5):
+    """Store repetitive string columns as categoricals (values are unchanged)
+    
+    Columns with at most max_category_ratio distinct values per row become
+    categorical; other columns keep their dtype (pandas' Arrow-backed str
+    dtype where enabled).
+    """
+    for col in df.columns:
+        values = df[col]
+        if len(values) and (values.dtype == object or pd.api.types.is_string_dtype(values.dtype)):
+            if values.nunique(dropna=False) <= len(values) * max_category_ratio:
+                df[col] = values.astype('category')
+    return df
+
+
+def load_lookup_file(file_path, columns=None, cache=None):
+    """Load a lookup reference file into the lookup_files entry format
+    
+    Only the given columns are read (all of them if None); the rest are
+    listed in 'columns' and read on demand by ensure_lookup_columns().
+    Loaded columns are stored compactly (see compact_frame). With a
+    LookupCache, columns and key indexes are served from / saved to disk.
+    """
+    lookup_info = {
+        'path': file_path,
+        'columns': None,
+        'df': None,  # loaded columns only, None until something is needed
+        'indexes': {},  # key column -> LookupIndex, built on first use
+        'cache': cache
+    }
+    if columns is None:
+        lookup_df = _read_lookup_columns(lookup_info, None)
+        lookup_info['columns'] = list(lookup_df.columns)
+        lookup_info['df'] = lookup_df
+    else:
+        # Opening a big workbook just for its header is slow - cache it too
+        lookup_info['columns'] = cache.load_header(file_path) if cache is not None else None
+        if lookup_info['columns'] is None:
+            lookup_info['columns'] = probe_columns(file_path)
+            if cache is not None:
+                cache.store_header(file_path, lookup_info['columns'])
+        ensure_lookup_columns(lookup_info, columns)
+    return lookup_info
+
+
+def _read_lookup_columns(lookup_info, usecols):
+    """Columns of a lookup file from its cache if possible, else parsed (and cached)"""
+    cache = lookup_info.get('cache')
+    if cache is not None and usecols is not None:
+        lookup_df = cache.load_columns(lookup_info['path'], usecols)
+        if lookup_df is not None:
+            return lookup_df
+    lookup_df = compact_frame(load_dataframe(lookup_info['path'], usecols=usecols))
+    if cache is not None:
+        cache.store_columns(lookup_info['path'], lookup_df)
+    return lookup_df
+
+
+def ensure_lookup_columns(lookup_info, columns):
+    """Make sure the given columns of a lookup file are loaded, reading missing ones from disk"""
+    lookup_df = lookup_info['df']
+    loaded = [] if lookup_df is None else list(lookup_df.columns)
+    missing = [col for col in columns if col not in loaded]
+    if not missing:
+        return lookup_df
+    unknown = [col for col in missing if col not in lookup_info['columns']]
+    if unknown:
+        raise KeyError(f"Column(s) not in lookup file: {', '.join(map(str, unknown))}")
+    
+    # Re-read the loaded columns too, so every column comes from the same parse
+    wanted = set(loaded) | set(missing)
+    usecols = [col for col in lookup_info['columns'] if col in wanted]
+    lookup_df = _read_lookup_columns(lookup_info, usecols)
+    if lookup_info['df'] is not None and len(lookup_df) != len(lookup_info['df']):
+        lookup_info['indexes'] = {}
+    for lookup_index in lookup_info['indexes'].values():
+        lookup_index.lookup_df = lookup_df
+    lookup_info['df'] = lookup_df
+    return lookup_df
+
+
+def copy_lookup_file(lookup_info):
+    """Copy of a lookup_files entry that can be loaded further without changing lookup_info
+    
+    Loaded columns and built indexes are shared, not duplicated; columns
+    loaded and indexes built through the copy do not show in lookup_info.
+    Lets one thread load lookups while others read the original.
+    """
+    indexes = {}
+    for index_key, lookup_index in lookup_info['indexes'].items():
+        lookup_index = copy.copy(lookup_index)
+        lookup_index.value_arrays = dict(lookup_index.value_arrays)
+        indexes[index_key] = lookup_index
+    return dict(lookup_info, indexes=indexes)
+
+
+def lookup_memory_usage(lookup_info):
+    """Bytes held by a lookup file's loaded columns and indexes"""
+    nbytes = sum(index.nbytes for index in lookup_info['indexes'].values())
+    if lookup_info['df'] is not None:
+        nbytes += int(lookup_info['df'].memory_usage(index=True, deep=True).sum())
+    return nbytes
+
+
+def get_lookup_index(lookup_info, key_column, normalize=()):
+    """Return the index for a lookup file key column, building it on first use
+    
+    Indexes are kept per key column (a tuple for composite keys) and
+    normalization.
+    """
+    index_key = (key_column, tuple(normalize)) if normalize else key_column
+    if index_key not in lookup_info['indexes']:
+        lookup_df = ensure_lookup_columns(lookup_info, _as_list(key_column))
+        cache = lookup_info.get('cache')
+        rows = cache.load_rows(lookup_info['path'], index_key) if cache is not None else None
+        if rows is not None and len(rows) and rows.max() >= len(lookup_df):
+            rows = None
+        lookup_index = LookupIndex(lookup_df, key_column, rows, normalize)
+        if cache is not None and rows is None:
+            cache.store_rows(lookup_info['path'], index_key, lookup_index.rows)
+        lookup_info['indexes'][index_key] = lookup_index
+    return lookup_info['indexes'][index_key]
+
+
+def lookup_match_options(lookup_config):
+    """(normalize steps, match mode, fuzzy cutoff) of a lookup config, hashable"""
+    normalize = lookup_config.get('normalize') or ()
+    if isinstance(normalize, str):
+        normalize = [normalize]
+    match = lookup_config.get('match') or 'exact'
+    if match not in MATCH_MODES:
+        raise ValueError(f"Unknown lookup match mode: {match}")
+    return (tuple(normalize), match, float(lookup_config.get('fuzzy_cutoff', DEFAULT_FUZZY_CUTOFF)))
+
+
+def _as_list(columns):
+    return list(columns) if isinstance(columns, (list, tuple)) else [columns]
+
+
+def _key_columns(columns):
+    """A lookup key or source column setting as a hashable key: column, or tuple for composite keys"""
+    if isinstance(columns, (list, tuple)):
+        return tuple(columns) if len(columns) > 1 else columns[0]
+    return columns
+
+
+def lookup_columns(lookup_groups):
+    """Columns each lookup file needs for the planned lookups, {lookup file: [columns]}"""
+    needed = {}
+    
+    def add(lookup_file, columns):
+        file_columns = needed.setdefault(lookup_file, [])
+        for col in columns:
+            if col not in file_columns:
+                file_columns.append(col)
+    
+    for (lookup_file, source_column, lookup_key, match_options), targets in lookup_groups.items():
+        add(lookup_file, _as_list(lookup_key) + [value_column for asn_col, value_column, chain in targets])
+        for asn_col, value_column, chain in targets:
+            for hop_file, hop_key, hop_value, hop_options in chain:
+                add(hop_file, [hop_key, hop_value])
+    return needed
+
+
+def plan_lookups(mappings):
+    """Group Lookup mappings by (lookup file, source column, lookup key, match options)
+    
+    Each group lists (asn column, value column, chain) targets, chain being
+    ((lookup file, lookup key, lookup value, match options), ...) hops that
+    look the value up again. Composite keys are tuples of columns.
+    """
+    lookup_groups = {}
+    for asn_col, mapping in mappings.items():
+        lookup_config = mapping.get('lookup_config')
+        if mapping.get('type') == "Lookup" and lookup_config:
+            source_column = _key_columns(lookup_config['source_column'])
+            lookup_key = _key_columns(lookup_config['lookup_key'])
+            if len(_as_list(source_column)) != len(_as_list(lookup_key)):
+                raise ValueError(f"Lookup for '{asn_col}' needs one source column per lookup key column")
+            chain = tuple((hop['lookup_file'], hop['lookup_key'], hop['lookup_value'], lookup_match_options(hop))
+                          for hop in lookup_config.get('chain') or [])
+            group_key = (lookup_config['lookup_file'], source_column, lookup_key,
+                         lookup_match_options(lookup_config))
+            lookup_groups.setdefault(group_key, []).append((asn_col, lookup_config['lookup_value'], chain))
+    return lookup_groups
+
+
+def lookup_label(group_key):
+    """Readable name of a lookup group, e.g. 'Supplier -> owners.Code (fuzzy)'"""
+    lookup_file, source_column, lookup_key, (normalize, match, fuzzy_cutoff) = group_key
+    label = f"{'+'.join(map(str, _as_list(source_column)))} -> {lookup_file}.{'+'.join(map(str, _as_list(lookup_key)))}"
+    details = list(normalize) + ([match] if match != 'exact' else [])
+    return f"{label} ({', '.join(details)})" if details else label
+
+
+def _match_masks(source_values, positions):
+    """(source frame, matched, blank, unmatched) row masks of one lookup (or chain hop)"""
+    source_frame = source_values.to_frame() if isinstance(source_values, pd.Series) else pd.DataFrame(source_values)
+    source_frame = source_frame.astype(object)
+    matched = positions >= 0
+    # Composite keys are blank only when every part is
+    blank = (source_frame.isna() | (source_frame == '')).all(axis=1).to_numpy() & ~matched
+    return source_frame, matched, blank, ~matched & ~blank
+
+
+def _add_match_stats(stats, label, masks):
+    """Accumulate matched/unmatched counts of one lookup (or chain hop) into stats"""
+    entry = stats.setdefault(label, {
+        'rows': 0, 'matched': 0, 'unmatched': 0, 'blank': 0, 'unmatched_examples': []})
+    source_frame, matched, blank, unmatched = masks
+    entry['rows'] += len(matched)
+    entry['matched'] += int(matched.sum())
+    entry['blank'] += int(blank.sum())
+    entry['unmatched'] += int(unmatched.sum())
+    if unmatched.any() and len(entry['unmatched_examples']) < 5:
+        examples = source_frame[unmatched].head(1000).fillna('').astype(str).agg('|'.join, axis=1)
+        for value in pd.unique(examples):
+            if value not in entry['unmatched_examples'] and len(entry['unmatched_examples']) < 5:
+                entry['unmatched_examples'].append(value)
+
+
+def _resolve_chain(values, value_column, chain, lookup_files, stats=None, unmatched=None):
+    """Look values up again through each chain hop, vectorized
+    
+    Rows whose non-blank value a hop does not find are set in the
+    unmatched mask (updated in place) when one is given.
+    """
+    for hop_file, hop_key, hop_value, (normalize, match, fuzzy_cutoff) in chain:
+        lookup_index = get_lookup_index(lookup_files[hop_file], hop_key, normalize)
+        positions = lookup_index.positions(values, match, fuzzy_cutoff)
+        masks = _match_masks(pd.Series(values), positions)
+        if stats is not None:
+            label = lookup_label((hop_file, value_column, hop_key, (normalize, match, fuzzy_cutoff)))
+            _add_match_stats(stats, label, masks)
+        if unmatched is not None:
+            unmatched |= masks[3]
+        values = lookup_index.lookup(None, hop_value, positions)
+        value_column = hop_value
+    return values
+
+
+def perform_lookups(source_df, lookup_groups, lookup_files, errors, progress=None, stats=None,
+                    profiler=None, misses=None):
+    """Resolve every lookup group with a single key match, returns {asn_col: values}
+    
+    A group that fails is filled with '' and its message appended to errors.
+    With a stats dict, matched/unmatched/blank row counts are added per group.
+    A RunProfiler times each group under the ASN columns it fills. With a
+    misses dict, each ASN column gets a mask of the rows whose non-blank key
+    (or a chain hop's value) was not found.
+    """
+    results = {}
+    # Read any columns not loaded yet with one parse per lookup file
+    for lookup_file, columns in lookup_columns(lookup_groups).items():
+        if lookup_file in lookup_files:
+            try:
+                ensure_lookup_columns(lookup_files[lookup_file], columns)
+            except Exception:
+                pass  # Reported per group below
+    
+    for group_number, group_key in enumerate(lookup_groups, start=1):
+        lookup_file, source_column, lookup_key, (normalize, match, fuzzy_cutoff) = group_key
+        targets = lookup_groups[group_key]
+        if progress:
+            progress('Lookups', group_number, len(lookup_groups))
+        try:
+            with _measure(profiler, column=", ".join(asn_col for asn_col, value_column, chain in targets)) as block:
+                block['rows'] = len(source_df)
+                # Reuse the prebuilt key index across columns and generations
+                lookup_index = get_lookup_index(lookup_files[lookup_file], lookup_key, normalize)
+                
+                # Match keys once, then gather every requested value column
+                source_values = source_df[list(source_column) if isinstance(source_column, tuple) else source_column]
+                positions = lookup_index.positions(source_values, match, fuzzy_cutoff)
+                masks = _match_masks(source_values, positions)
+                if stats is not None:
+                    _add_match_stats(stats, lookup_label(group_key), masks)
+                for asn_col, value_column, chain in targets:
+                    values = lookup_index.lookup(None, value_column, positions)
+                    unmatched = masks[3].copy() if misses is not None else None
+                    results[asn_col] = _resolve_chain(values, value_column, chain, lookup_files, stats, unmatched)
+                    if misses is not None:
+                        misses[asn_col] = unmatched
+        except Exception as e:
+            errors.append(f"Failed to perform lookup: {str(e)}")
+            for asn_col, value_column, chain in targets:
+                results[asn_col] = constant_column("", len(source_df))
+    return results
+
+
+class MappingPlan:
+    """Compiled mapping: one (asn column, operation, argument) entry per template column
+    
+    Operations are 'direct' (source column), 'multi_select' (source columns),
+    'lookup' (value column, resolved through lookup_groups), 'manual_input'
+    (constant value) and 'empty'. Build with compile_plan().
+    """
+    
+    def __init__(self, operations, lookup_groups, header=None):
+        self.operations = operations
+        self.lookup_groups = lookup_groups
+        self.header = header  # Source columns the plan was compiled against
+        self.lookup_stats = {}  # Lookup label -> match counts, summed over execute() calls
+    
+    @property
+    def processing_summary(self):
+        """Number of template columns per operation"""
+        summary = {'direct': 0, 'multi_select': 0, 'lookup': 0, 'manual_input': 0, 'empty': 0}
+        for asn_col, operation, argument in self.operations:
+            summary[operation] += 1
+        return summary
+    
+    @property
+    def source_columns(self):
+        """Source columns the plan reads, in first-use order"""
+        columns = []
+        for asn_col, operation, argument in self.operations:
+            if operation == 'direct':
+                columns.append(argument)
+            elif operation == 'multi_select':
+                columns.extend(argument)
+        for lookup_file, source_column, lookup_key, match_options in self.lookup_groups:
+            columns.extend(_as_list(source_column))
+        return list(dict.fromkeys(columns))
+    
+    @property
+    def load_columns(self):
+        """Columns to read from the source (usecols), or None to read all
+        
+        The used columns that exist in the header; at least one column is
+        kept so the row count survives when only constants are mapped.
+        """
+        if self.header is None:
+            return None
+        header = set(self.header)
+        return [col for col in self.source_columns if col in header] or list(self.header)[:1]
+    
+    def execute(self, source_df, lookup_files, progress=None, profiler=None, lookup_misses=None):
+        """Apply the plan to source_df, returns (asn_df, errors)
+        
+        errors lists lookup failures that were filled with blanks instead of
+        aborting the run. progress(phase, done, total) is called as work
+        completes and may raise GenerationCancelled to stop. A RunProfiler
+        records each phase and each mapped ASN column. A lookup_misses dict
+        receives the unmatched-key row mask of each lookup column (see
+        AsnValidator).
+        """
+        errors = []
+        rows = len(source_df)
+        
+        # Resolve all Lookup mappings up front, one key match per lookup group
+        with _measure(profiler, 'lookup') as block:
+            block['rows'] = rows
+            lookup_results = perform_lookups(source_df, self.lookup_groups, lookup_files, errors, progress,
+                                             self.lookup_stats, profiler, lookup_misses)
+        
+        asn_data = {}
+        constant_codes = np.zeros(rows, dtype=np.int8)
+        for column_number, (asn_col, operation, argument) in enumerate(self.operations, start=1):
+            if progress:
+                progress('Mapping', column_number, len(self.operations))
+            # Lookups were timed per group above; unmapped columns are not worth listing
+            phase = operation if operation != 'lookup' else None
+            column = asn_col if operation in ('direct', 'multi_select', 'manual_input') else None
+            with _measure(profiler, phase, column) as block:
+                block['rows'] = rows
+                if operation == 'direct':
+                    asn_data[asn_col] = source_df[argument].values
+                elif operation == 'multi_select':
+                    asn_data[asn_col] = combine_columns(source_df, argument)
+                elif operation == 'lookup':
+                    asn_data[asn_col] = lookup_results[asn_col]
+                elif operation == 'manual_input':
+                    asn_data[asn_col] = constant_column(argument, rows, constant_codes)
+                else:
+                    asn_data[asn_col] = constant_column("", rows, constant_codes)
+        
+        with _measure(profiler, 'assemble') as block:
+            block['rows'] = rows
+            asn_df = pd.DataFrame(asn_data)
+        return asn_df, errors
+
+
+def compile_plan(mappings, source_columns, asn_template=ASN_TEMPLATE):
+    """Compile mapping configuration against the source header into a MappingPlan
+    
+    Direct mappings to columns missing from the source become 'empty';
+    Multi-Select drops missing columns (and still counts as multi-select).
+    """
+    header = list(source_columns)
+    source_columns = set(header)
+    operations = []
+    
+    for asn_col in asn_template.keys():
+        mapping = mappings.get(asn_col, {})
+        mapping_type = mapping.get('type')
+        source_column = mapping.get('source_column')
+        
+        if mapping_type == "Direct" and source_column != BLANK_OPTION and source_column in source_columns:
+            operations.append((asn_col, 'direct', source_column))
+        elif mapping_type == "Multi-Select" and mapping.get('selections'):
+            selections = [col for col in mapping['selections'] if col in source_columns]
+            operations.append((asn_col, 'multi_select', selections))
+        elif mapping_type == "Lookup" and mapping.get('lookup_config'):
+            operations.append((asn_col, 'lookup', mapping['lookup_config']['lookup_value']))
+        elif mapping_type == "Manual Input" and 'value' in mapping:
+            operations.append((asn_col, 'manual_input', mapping['value']))
+        else:
+            # Unmapped or incompletely configured column
+            operations.append((asn_col, 'empty', None))
+    
+    lookup_mappings = {asn_col: mappings[asn_col] for asn_col, operation, argument in operations
+                       if operation == 'lookup'}
+    return MappingPlan(operations, plan_lookups(lookup_mappings), header)
+
+
+def generate_asn_data(source_df, mappings, lookup_files, asn_template=ASN_TEMPLATE):
+    """Compile mappings against source_df and run them
+    
+    Returns (asn_df, processing_summary, errors).
+    """
+    plan = compile_plan(mappings, source_df.columns, asn_template)
+    asn_df, errors = plan.execute(source_df, lookup_files)
+    return asn_df, plan.processing_summary, errors
+
+
+def _blank_mask(values):
+    """True where values are missing or whitespace-only, judged once per distinct value"""
+    values = pd.Series(values)
+    if pd.api.types.is_numeric_dtype(values.dtype) or pd.api.types.is_datetime64_any_dtype(values.dtype):
+        return values.isna().to_numpy()
+    if isinstance(values.dtype, pd.StringDtype):
+        # Arrow-backed strings are stripped and compared in one native pass
+        return (values.str.strip().eq('') | values.isna()).to_numpy(dtype=bool, na_value=True)
+    codes, uniques = pd.factorize(values)
+    blank_uniques = pd.Series(uniques, dtype=object).astype(str).str.strip().eq('').to_numpy()
+    return np.where(codes < 0, True, blank_uniques[codes])
+
+
+def _numeric_values(values):
+    """values as float64 (NaN where blank or not a number), parsed once per distinct value"""
+    values = pd.Series(values)
+    if pd.api.types.is_numeric_dtype(values.dtype) and not pd.api.types.is_bool_dtype(values.dtype):
+        return values.to_numpy(dtype=float, na_value=np.nan)
+    codes, uniques = pd.factorize(values)
+    text = pd.Series(uniques, dtype=object).astype(str).str.strip()
+    numbers = pd.to_numeric(text, errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+    return np.where(codes < 0, np.nan, numbers[codes])
+
+
+def _line_token(value):
+    """Hashable text for a cell, equal for cells that compare equal (1 and 1.0 alike)"""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return value if isinstance(value, str) else '\x00' + repr(value)
+
+
+_line_tokens = np.frompyfunc(_line_token, 1, 1)
+_NULL_LINE_HASH = np.uint64(0x9E3779B97F4A7C15)
+
+
+class AsnValidator:
+    """Checks generated ASN rows before they reach the WMS, collecting a rejection report
+    
+    Required template columns must be filled, NUMERIC_COLUMNS must hold
+    non-negative numbers (POSITIVE_COLUMNS above zero), lookups must find
+    every non-blank key and no line may repeat an earlier one. Checks run
+    on whole columns and judge each distinct value once. Feed check() the
+    whole ASN frame or, with chunked=True, streamed chunks in order (lines
+    are then hashed so duplicates are found across chunks; one dict entry
+    per distinct line is kept). report() returns one row per issue, with
+    Row as the spreadsheet row of the source line.
+    """
+    
+    def __init__(self, plan, asn_template=ASN_TEMPLATE, chunked=False):
+        operations = {asn_col: operation for asn_col, operation, argument in plan.operations}
+        required = [asn_col for asn_col, flag in asn_template.items() if flag == 1 and asn_col in operations]
+        self.unmapped = [asn_col for asn_col in required if operations[asn_col] == 'empty']
+        self.required = [asn_col for asn_col in required if operations[asn_col] != 'empty']
+        self.numeric = [asn_col for asn_col in NUMERIC_COLUMNS if operations.get(asn_col, 'empty') != 'empty']
+        # Constant columns cannot tell lines apart
+        self.line_columns = [asn_col for asn_col, operation in operations.items()
+                             if operation in ('direct', 'multi_select', 'lookup')]
+        self.chunked = chunked
+        self.rows = 0
+        self._issues = []  # (row numbers, ASN column, issue, values or None)
+        self._seen_lines = {}  # Chunked: line hash -> row it first appeared in
+    
+    def _add(self, row_numbers, mask, asn_col, issue, values=None):
+        if mask.any():
+            self._issues.append((row_numbers[mask], asn_col, issue,
+                                 None if values is None else np.asarray(values, dtype=object)[mask]))
+    
+    def check(self, asn_df, lookup_misses=None):
+        """Validate the next len(asn_df) rows (lookup_misses from MappingPlan.execute)"""
+        if self.rows and not self.chunked:
+            raise ValueError("AsnValidator(chunked=False) checks a single frame; pass chunked=True for chunks")
+        row_numbers = np.arange(self.rows, self.rows + len(asn_df)) + 2  # Header is row 1
+        self.rows += len(asn_df)
+        lookup_misses = lookup_misses or {}
+        
+        for asn_col in self.required:
+            blank = _blank_mask(asn_df[asn_col])
+            if asn_col in lookup_misses:
+                blank = blank & ~lookup_misses[asn_col]  # Reported as a lookup miss below
+            self._add(row_numbers, blank, asn_col, 'empty')
+        
+        for asn_col in self.numeric:
+            values = asn_df[asn_col]
+            numbers = _numeric_values(values)
+            blank = _blank_mask(values)
+            self._add(row_numbers, np.isnan(numbers) & ~blank, asn_col, 'not a number', values)
+            self._add(row_numbers, numbers < 0, asn_col, 'negative', values)
+            if asn_col in POSITIVE_COLUMNS:
+                self._add(row_numbers, numbers == 0, asn_col, 'zero', values)
+        
+        for asn_col, unmatched in lookup_misses.items():
+            self._add(row_numbers, unmatched, asn_col, 'lookup miss')
+        
+        if self.line_columns and len(asn_df):
+            # Number each distinct line, then find the row where it first appeared
+            codes, uniques = pd.factorize(self._line_keys(asn_df))
+            first_rows = np.empty(len(uniques), dtype=np.int64)
+            first_rows[codes[::-1]] = row_numbers[::-1]
+            if self.chunked:
+                earlier = np.fromiter((self._seen_lines.get(key, -1) for key in uniques.tolist()),
+                                      dtype=np.int64, count=len(uniques))
+                new_lines = earlier < 0
+                first_rows = np.where(new_lines, first_rows, earlier)
+                self._seen_lines.update(zip(uniques[new_lines].tolist(), first_rows[new_lines].tolist()))
+            first_row = first_rows[codes]
+            duplicate = first_row != row_numbers
+            if duplicate.any():
+                self._issues.append((row_numbers[duplicate], 'all mapped columns', 'duplicate line',
+                                     np.char.add('same as row ', first_row[duplicate].astype(str))))
+    
+    def _line_keys(self, asn_df):
+        """One integer per row, equal for identical lines
+        
+        Chunked: a 64-bit hash combining each value's _line_token, comparable
+        across chunks even when one chunk read a column as int and another
+        as float. Each distinct value is hashed once and on its own
+        (hash_pandas_object on a frame can hash a row differently depending
+        on the rows around it). Otherwise the columns' factorized codes are
+        combined, which avoids hashing every distinct string.
+        """
+        if self.chunked:
+            keys = np.zeros(len(asn_df), dtype=np.uint64)
+            for asn_col in self.line_columns:
+                codes, uniques = pd.factorize(asn_df[asn_col])
+                uniques = np.asarray(uniques, dtype=object)
+                if pd.api.types.infer_dtype(uniques) != 'string':
+                    uniques = _line_tokens(uniques).astype(object)
+                hashes = np.append(pd.util.hash_array(uniques, categorize=False), _NULL_LINE_HASH)
+                keys = keys * np.uint64(1000003) ^ hashes[codes]  # codes -1 (null) picks the last
+            return keys
+        keys = np.zeros(len(asn_df), dtype=np.int64)
+        key_count = 1
+        for asn_col in self.line_columns:
+            codes, uniques = pd.factorize(asn_df[asn_col])
+            if key_count * (len(uniques) + 1) >= 2 ** 62:
+                keys, key_uniques = pd.factorize(keys)  # Renumber to stay within int64
+                key_count = len(key_uniques)
+            keys = keys * (len(uniques) + 1) + (codes + 1)
+            key_count *= len(uniques) + 1
+        return keys
+    
+    def report(self):
+        """Issues as a DataFrame (Row, ASN Column, Issue, Value), column-level issues first"""
+        column_issues = [(None, asn_col, 'required column not mapped', None) for asn_col in self.unmapped]
+        empty_counts = {}
+        for row_numbers, asn_col, issue, values in self._issues:
+            if issue == 'empty':
+                empty_counts[asn_col] = empty_counts.get(asn_col, 0) + len(row_numbers)
+        # A column empty in every row is one issue, not one per row
+        all_empty = [asn_col for asn_col, count in empty_counts.items() if count == self.rows]
+        column_issues.extend((None, asn_col, 'empty in every row', None) for asn_col in all_empty)
+        
+        row_issues = []
+        for row_numbers, asn_col, issue, values in self._issues:
+            if issue == 'empty' and asn_col in all_empty:
+                continue
+            row_issues.append(pd.DataFrame({
+                'Row': row_numbers, 'ASN Column': asn_col, 'Issue': issue,
+                'Value': '' if values is None else pd.Series(values, dtype=object).astype(str).to_numpy()}))
+        
+        report_df = pd.DataFrame(column_issues, columns=['Row', 'ASN Column', 'Issue', 'Value'])
+        if row_issues:
+            rows_df = pd.concat(row_issues, ignore_index=True).sort_values('Row', kind='stable')
+            report_df = pd.concat([report_df.astype({'Row': 'Int64'}), rows_df.astype({'Row': 'Int64'})],
+                                  ignore_index=True)
+        return report_df
+    
+    def summary(self, report_df=None):
+        """Counts per issue: {'rows', 'rows_with_issues', 'column_issues', 'issues': {'column: issue': n}}"""
+        report_df = self.report() if report_df is None else report_df
+        row_issues = report_df[report_df['Row'].notna()]
+        return {
+            'rows': self.rows,
+            'rows_with_issues': int(row_issues['Row'].nunique()),
+            'column_issues': [f"{row['ASN Column']}: {row['Issue']}"
+                              for row in report_df[report_df['Row'].isna()].to_dict('records')],
+            'issues': {f"{asn_col}: {issue}": int(count)
+                       for (asn_col, issue), count in row_issues.groupby(['ASN Column', 'Issue'], sort=False).size().items()},
+        }
+    
+    @property
+    def has_issues(self):
+        return bool(self.unmapped or self._issues)
+
+
+def write_validation_report(validator, output_path):
+    """Write the validator's issues to {output name}_validation.csv, returns its summary
+    
+    Nothing is written when there are no issues; otherwise the summary's
+    'report' is the CSV path.
+    """
+    report_df = validator.report()
+    summary = validator.summary(report_df)
+    if len(report_df):
+        report_path = f"{os.path.splitext(output_path)[0]}_validation.csv"
+        with partial_output(report_path) as partial_path:
+            report_df.to_csv(partial_path, index=False)
+        summary['report'] = report_path
+    return summary
+
+
+def default_output_path(source_path, output_dir=None, output_format='xlsx'):
+    """{YYYYMMDD}_{source name}.{format} in output_dir (the working directory by default)"""
+    date_str = datetime.now().strftime("%Y%m%d")
+    ref_name = os.path.splitext(os.path.basename(source_path))[0]
+    return os.path.join(output_dir or os.getcwd(), f"{date_str}_{ref_name}.{output_format}")
+
+
+def batch_output_paths(source_paths, output_dir=None, output_format='xlsx', taken=(), keep_existing=False):
+    """{source path: default_output_path()}, with _2, _3... added where outputs would collide
+    
+    Sources with the same name in different folders (or with different
+    extensions) would otherwise overwrite each other. Paths in taken, e.g.
+    outputs still being written, count as used; with keep_existing so do
+    files already on disk.
+    """
+    used = {os.path.normcase(os.path.abspath(path)) for path in taken}
+    output_paths = {}
+    for source_path in source_paths:
+        output_path = default_output_path(source_path, output_dir, output_format)
+        base, ext = os.path.splitext(output_path)
+        suffix = 2
+        while (os.path.normcase(os.path.abspath(output_path)) in used
+               or (keep_existing and os.path.exists(output_path))):
+            output_path = f"{base}_{suffix}{ext}"
+            suffix += 1
+        used.add(os.path.normcase(os.path.abspath(output_path)))
+        output_paths[source_path] = output_path
+    return output_paths
+
+
+def check_split_column(split_column, asn_columns=ASN_TEMPLATE):
+    """Raise ValueError listing the valid ASN columns if split_column is not one of them"""
+    if split_column not in asn_columns:
+        raise ValueError(f"Cannot split by '{split_column}': not an ASN column. "
+                         f"Valid columns: {', '.join(asn_columns)}")
+
+
+@contextmanager
+def partial_output(output_path):
+    """Yield a .partial path next to output_path, renamed into place on success
+    
+    A failed or cancelled write never leaves a half-written output behind.
+    """
+    base, ext = os.path.splitext(output_path)
+    partial_path = f"{base}.partial{ext}"
+    try:
+        yield partial_path
+        os.replace(partial_path, output_path)
+    except BaseException:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise
+
+
+def _excel_rows(asn_df):
+    """Rows of asn_df as plain Python values, missing/'' values as empty cells"""
+    values = asn_df.astype(object)
+    return values.where(asn_df.notna() & (values != ""), None).itertuples(index=False, name=None)
+
+
+class XlsxRowWriter:
+    """Append-only .xlsx writer that streams rows to disk
+    
+    Uses xlsxwriter in constant_memory mode when installed, otherwise
+    openpyxl's write-only mode; neither keeps the workbook in memory. Pass
+    engine='xlsxwriter' or 'openpyxl' to force one.
+    """
+    
+    def __init__(self, path, engine=None):
+        if engine is None:
+            engine = 'xlsxwriter' if _module_installed('xlsxwriter') else 'openpyxl'
+        self.path = path
+        self.engine = engine
+        self.row_count = 0
+        
+        if engine == 'xlsxwriter':
+            import xlsxwriter
+            self.workbook = xlsxwriter.Workbook(path, {
+                'constant_memory': True,
+                'strings_to_urls': False,
+                'default_date_format': 'yyyy-mm-dd hh:mm:ss'
+            })
+            self.sheet = self.workbook.add_worksheet()
+        elif engine == 'openpyxl':
+            import openpyxl
+            self.workbook = openpyxl.Workbook(write_only=True)
+            self.sheet = self.workbook.create_sheet()
+        else:
+            raise ValueError(f"Unknown xlsx writer engine: {engine}")
+    
+    def append(self, values):
+        """Write one row of plain Python values"""
+        if self.engine == 'xlsxwriter':
+            self.sheet.write_row(self.row_count, 0, values)
+        else:
+            self.sheet.append(values)
+        self.row_count += 1
+    
+    def append_frame(self, df, chunk_rows=DEFAULT_CHUNK_ROWS):
+        """Write the rows of df, converting chunk_rows rows at a time"""
+        for start in range(0, len(df), chunk_rows):
+            for row in _excel_rows(df.iloc[start:start + chunk_rows]):
+                self.append(row)
+    
+    def close(self):
+        if self.engine == 'xlsxwriter':
+            self.workbook.close()
+        else:
+            self.workbook.save(self.path)
+
+
+class CsvRowWriter:
+    """Append-only .csv writer with the same interface as XlsxRowWriter"""
+    
+    def __init__(self, path):
+        self.path = path
+        self.row_count = 0
+        self.file = open(path, 'w', encoding='utf-8', newline='')
+        self.writer = csv.writer(self.file, lineterminator=os.linesep)
+    
+    def append(self, values):
+        """Write one row of plain Python values"""
+        self.writer.writerow(values)
+        self.row_count += 1
+    
+    def append_frame(self, df, chunk_rows=DEFAULT_CHUNK_ROWS):
+        """Write the rows of df"""
+        df.to_csv(self.file, header=False, index=False, lineterminator=os.linesep)
+        self.row_count += len(df)
+    
+    def close(self):
+        self.file.close()
+
+
+def open_row_writer(path):
+    """CsvRowWriter or XlsxRowWriter depending on the file extension"""
+    file_ext = os.path.splitext(path)[1].lower()
+    if file_ext == '.csv':
+        return CsvRowWriter(path)
+    if file_ext == '.xlsx':
+        return XlsxRowWriter(path)
+    raise ValueError(f"Row-by-row writing supports .xlsx and .csv, not {file_ext}")
+
+
+def _parquet_frame(asn_df):
+    """asn_df with mixed-type object columns (e.g. lookup values with '' misses) as strings"""
+    parquet_df = asn_df.copy(deep=False)
+    for column in parquet_df.columns:
+        values = parquet_df[column]
+        if values.dtype == object and pd.api.types.infer_dtype(values, skipna=True) not in ('string', 'empty'):
+            parquet_df[column] = values.where(values.isna(), values.astype(str))
+    return parquet_df
+
+
+def write_output(asn_df, output_path, progress=None, engine=None):
+    """Write the generated ASN template; the format follows the file extension
+    
+    .csv and .parquet are written by pandas. .xlsx streams rows to disk through
+    XlsxRowWriter (engine picks its engine), or DataFrame.to_excel with
+    engine='pandas'.
+    """
+    file_ext = os.path.splitext(output_path)[1].lower()
+    with partial_output(output_path) as partial_path:
+        if progress:
+            progress('Writing', 0, len(asn_df))
+        if file_ext == '.csv':
+            asn_df.to_csv(partial_path, index=False, encoding='utf-8')
+        elif file_ext == '.parquet':
+            _parquet_frame(asn_df).to_parquet(partial_path, index=False)
+        elif engine == 'pandas':
+            asn_df.to_excel(partial_path, index=False)
+        else:
+            writer = XlsxRowWriter(partial_path, engine)
+            writer.append(list(asn_df.columns))
+            for start in range(0, len(asn_df), DEFAULT_CHUNK_ROWS):
+                writer.append_frame(asn_df.iloc[start:start + DEFAULT_CHUNK_ROWS])
+                if progress:
+                    progress('Writing', min(start + DEFAULT_CHUNK_ROWS, len(asn_df)), len(asn_df))
+            writer.close()
+        if progress:
+            progress('Writing', len(asn_df), len(asn_df))
+
+
+def _split_file_name(value):
+    """File name fragment for a split value (filesystem-safe, 'blank' when empty)"""
+    text = "" if pd.isna(value) else str(value).strip()
+    return re.sub(r'[^\w.-]+', '_', text).strip('._') or 'blank'
+
+
+def write_split_outputs(asn_df, output_path, split_column, progress=None, max_workers=None):
+    """Write one file per distinct split_column value, in parallel worker processes
+    
+    Files are named {output name}_{value}{ext} next to output_path (values
+    that name the same file, also case-insensitively on Windows, get a
+    _2, _3, ... suffix); with max_workers=1 they are written sequentially in this process. progress
+    ('Writing', files done, file count) is called as each file completes.
+    Returns the list of written paths.
+    """
+    check_split_column(split_column, list(asn_df.columns))
+    base, ext = os.path.splitext(output_path)
+    groups = []
+    used_paths = set()
+    for value, group_df in asn_df.groupby(split_column, sort=False, dropna=False, observed=True):
+        group_path = f"{base}_{_split_file_name(value)}{ext}"
+        suffix = 2
+        while os.path.normcase(group_path) in used_paths:
+            group_path = f"{base}_{_split_file_name(value)}_{suffix}{ext}"
+            suffix += 1
+        used_paths.add(os.path.normcase(group_path))
+        groups.append((group_path, group_df.reset_index(drop=True)))
+    
+    if progress:
+        progress('Writing', 0, len(groups))
+    if len(groups) <= 1 or max_workers == 1:
+        for group_path, group_df in groups:
+            write_output(group_df, group_path)
+    else:
+        max_workers = min(max_workers or os.cpu_count() or 1, len(groups))
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(write_output, group_df, group_path) for group_path, group_df in groups]
+            for done, future in enumerate(as_completed(futures), start=1):
+                future.result()
+                if progress:
+                    progress('Writing', done, len(groups))
+    
+    return [group_path for group_path, group_df in groups]
+
+
+def _excel_cell(value):
+    """Convert a raw Excel cell value the way pandas' Excel readers do"""
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _parse_row_chunks(rows, chunk_rows, usecols=None, dtype=None):
+    """Turn raw Excel rows (header first) into DataFrames parsed like read_excel
+    
+    Rows are trimmed/padded to the header width, so cells beyond the last
+    header column are ignored rather than becoming 'Unnamed' columns.
+    Trailing empty rows are dropped. With usecols only those columns (by
+    header name) are converted and parsed; the other cells are skipped.
+    dtype ({column: dtype}) is passed to the parser.
+    """
+    from pandas.io.parsers import TextParser
+    
+    header = None
+    positions = None
+    batch = []
+    empty_rows = []  # Held back until a non-empty row shows they are not trailing
+    yielded = False
+    for row in rows:
+        if header is None:
+            values = [_excel_cell(value) for value in row]
+            while values and values[-1] == "":
+                values.pop()
+            if values:
+                header = values
+                positions = range(len(header))
+                if usecols is not None:
+                    # Match against the de-duplicated names pandas gives the header
+                    names = TextParser([header], header=0).read().columns
+                    wanted = set(usecols)
+                    positions = [position for position, name in enumerate(names) if name in wanted]
+                    header = [header[position] for position in positions]
+            continue
+        
+        values = [_excel_cell(row[position]) if position < len(row) else "" for position in positions]
+        if all(value is None or value == "" for value in row):
+            empty_rows.append(values)
+            continue
+        if empty_rows:
+            batch.extend(empty_rows)
+            empty_rows = []
+        batch.append(values)
+        if len(batch) >= chunk_rows:
+            yield TextParser([header] + batch, header=0, skip_blank_lines=False, dtype=dtype).read()
+            yielded = True
+            batch = []
+    
+    if header is not None and (batch or not yielded):
+        yield TextParser([header] + batch, header=0, skip_blank_lines=False, dtype=dtype).read()
+
+
+def _resolve_chunk_dtypes(chunks):
+    """{column: dtype} a full load would give, found by reading every chunk
+    
+    Each chunk infers dtypes from its own rows: a numeric column is int in
+    chunks without blanks and float in chunks with one, and text anywhere
+    makes it object. The chunks' dtypes are combined as pd.concat would;
+    ints (bools) that meet a blank in any chunk become float (object), and
+    columns blank throughout float64.
+    """
+    seen = {}
+    blank = set()
+    for chunk in chunks:
+        for column in chunk.columns:
+            nulls = chunk[column].isna()
+            dtypes = seen.setdefault(column, set())
+            if nulls.any():
+                blank.add(column)
+            if not nulls.all():
+                dtypes.add(chunk[column].dtype)
+    
+    resolved = {}
+    for column, dtypes in seen.items():
+        if not dtypes:
+            resolved[column] = np.dtype('float64')
+            continue
+        dtype = pd.concat([pd.Series([], dtype=dtype) for dtype in dtypes]).dtype
+        if column in blank and dtype.kind in 'iu':
+            dtype = np.dtype('float64')
+        elif column in blank and dtype.kind == 'b':
+            dtype = np.dtype(object)
+        resolved[column] = dtype
+    return resolved
+
+
+def iter_source_chunks(file_path, chunk_rows=DEFAULT_CHUNK_ROWS, usecols=None):
+    """Yield the source file as DataFrames of at most chunk_rows rows
+    
+    CSV, .xlsx and .xlsb files are read incrementally, in two passes: the
+    first finds the dtype a full load would give each column
+    (_resolve_chunk_dtypes), the second yields chunks cast to it, so values
+    do not depend on where the chunk boundaries fall. Columns that resolve
+    to mixed text are re-read as text (leading zeros kept, as in a full
+    load).
+    Reading twice costs time, not memory. .xls (xlrd cannot stream) and
+    other formats are loaded whole and sliced. With usecols only those
+    columns are read.
+    """
+    file_format = sniff_format(file_path)
+    
+    if file_format == 'csv':
+        read = lambda dtype=None: pd.read_csv(file_path, chunksize=chunk_rows, usecols=usecols, dtype=dtype,
+                                              float_precision='round_trip')
+        text_dtype = str
+    elif file_format in ('xlsx', 'xlsb'):
+        read = lambda dtype=None: _iter_excel_rows(
+            file_path, lambda rows: _parse_row_chunks(rows, chunk_rows, usecols, dtype), file_format)
+        text_dtype = object
+    else:
+        source_df = load_dataframe(file_path, usecols=usecols)
+        for start in range(0, max(len(source_df), 1), chunk_rows):
+            yield source_df.iloc[start:start + chunk_rows]
+        return
+    
+    dtypes = _resolve_chunk_dtypes(read())
+    text_columns = {column: text_dtype for column, dtype in dtypes.items() if dtype == object}
+    for chunk in read(text_columns or None):
+        casts = {column: dtype for column, dtype in dtypes.items()
+                 if column not in text_columns and chunk[column].dtype != dtype}
+        yield chunk.astype(casts) if casts else chunk
+
+
+def _iter_excel_rows(file_path, parse, file_format):
+    """Yield parse(raw rows of the first sheet) for 'xlsx' (openpyxl) and 'xlsb' (pyxlsb) files"""
+    if file_format == 'xlsb':
+        from pyxlsb import open_workbook
+        with open_workbook(file_path) as workbook:
+            with workbook.get_sheet(1) as sheet:
+                yield from parse([cell.v for cell in row] for row in sheet.rows())
+    else:
+        import openpyxl
+        from openpyxl.cell.cell import ERROR_CODES
+        error_values = frozenset(ERROR_CODES)
+        # Opened from a file object so openpyxl does not insist on an Excel extension
+        with open(file_path, 'rb') as f:
+            workbook = openpyxl.load_workbook(f, read_only=True, data_only=True, keep_links=False)
+            try:
+                rows = workbook.worksheets[0].iter_rows(values_only=True)
+                # read_excel reads error cells (#DIV/0!, #N/A, #REF!, ...) as NaN
+                yield from parse([None if value in error_values else value for value in row] for row in rows)
+            finally:
+                workbook.close()
+
+
+def stream_asn_file(source_path, plan, lookup_files, output_path,
+                    chunk_rows=DEFAULT_CHUNK_ROWS, progress=None, profiler=None, validator=None):
+    """Run plan over source_path chunk by chunk, appending rows to output_path
+    
+    Memory stays bounded by chunk_rows regardless of file size. The output
+    (.xlsx or .csv) is written with open_row_writer(). progress('Streaming',
+    rows, None) is called after each chunk and may raise GenerationCancelled.
+    A RunProfiler sums the load, mapping and write phases over all chunks;
+    an AsnValidator(chunked=True) checks every chunk. Returns (row_count, errors).
+    """
+    errors = []
+    with partial_output(output_path) as partial_path:
+        writer = open_row_writer(partial_path)
+        writer.append([asn_col for asn_col, operation, argument in plan.operations])
+        row_count = 0
+        chunks = iter_source_chunks(source_path, chunk_rows, plan.load_columns)
+        while True:
+            with _measure(profiler, 'load') as block:
+                chunk = next(chunks, None)
+                block['rows'] = len(chunk) if chunk is not None else 0
+            if chunk is None:
+                break
+            lookup_misses = {} if validator is not None else None
+            asn_chunk, chunk_errors = plan.execute(chunk, lookup_files, profiler=profiler,
+                                                   lookup_misses=lookup_misses)
+            errors.extend(error for error in chunk_errors if error not in errors)
+            if validator is not None:
+                with _measure(profiler, 'validate') as block:
+                    block['rows'] = len(asn_chunk)
+                    validator.check(asn_chunk, lookup_misses)
+            with _measure(profiler, 'write') as block:
+                block['rows'] = len(asn_chunk)
+                writer.append_frame(asn_chunk)
+            row_count += len(asn_chunk)
+            if progress:
+                progress('Streaming', row_count, None)
+        with _measure(profiler, 'write'):
+            writer.close()
+    
+    return row_count, errors
+
+
+def load_profile(profile_path):
+    """Load a saved mapping profile, returns (mappings, {lookup name: path})
+    
+    Profile format (JSON):
+        {"mappings": {asn column: mapping, ...},
+         "lookup_files": {lookup name: path, ...}}
+    Relative lookup paths are resolved against the profile's directory.
+    """
+    with open(profile_path, encoding='utf-8') as f:
+        profile = json.load(f)
+    
+    base_dir = os.path.dirname(os.path.abspath(profile_path))
+    lookup_paths = {name: os.path.normpath(os.path.join(base_dir, path))
+                    for name, path in profile.get('lookup_files', {}).items()}
+    return profile.get('mappings', {}), lookup_paths
+
+
+def _header_name(column):
+    """A header name as header_signature compares it (case and surrounding whitespace ignored)"""
+    return str(column).strip().casefold()
+
+
+def header_signature(columns):
+    """Order-, case- and whitespace-insensitive fingerprint of a source header"""
+    names = sorted(_header_name(col) for col in columns)
+    return hashlib.sha1('\x1f'.join(names).encode('utf-8')).hexdigest()
+
+
+def match_profile_columns(mappings, columns):
+    """mappings with their source column names spelled as in columns
+    
+    A profile found by header_signature may name 'Qty' where the source
+    header says 'QTY '. Direct, Multi-Select and lookup source columns are
+    renamed to the source's spelling; names without a counterpart are kept.
+    """
+    exact = set(columns)
+    spelled = {}
+    for col in columns:
+        spelled.setdefault(_header_name(col), col)
+    
+    def respell(column):
+        if isinstance(column, list):
+            return [respell(col) for col in column]
+        if column in exact or not isinstance(column, str):
+            return column
+        return spelled.get(_header_name(column), column)
+    
+    matched = {}
+    for asn_col, mapping in mappings.items():
+        mapping = dict(mapping)
+        if 'source_column' in mapping:
+            mapping['source_column'] = respell(mapping['source_column'])
+        if 'selections' in mapping:
+            mapping['selections'] = respell(list(mapping['selections']))
+        if 'source_column' in (mapping.get('lookup_config') or {}):
+            config = mapping['lookup_config']
+            mapping['lookup_config'] = dict(config, source_column=respell(config['source_column']))
+        matched[asn_col] = mapping
+    return matched
+
+
+def save_profile(profile_path, mappings, lookup_paths, source_columns=None):
+    """Write mappings and lookup file references in the load_profile format
+    
+    Lookup paths are stored relative to the profile's directory when possible.
+    Direct mappings left blank are the default and are not stored. With
+    source_columns the header signature is saved for find_matching_profile.
+    """
+    base_dir = os.path.dirname(os.path.abspath(profile_path))
+    stored_paths = {}
+    for name, path in lookup_paths.items():
+        try:
+            stored_paths[name] = os.path.relpath(os.path.abspath(path), base_dir)
+        except ValueError:
+            # Different drive on Windows
+            stored_paths[name] = os.path.abspath(path)
+    
+    profile = {
+        'mappings': {asn_col: mapping for asn_col, mapping in mappings.items()
+                     if not (mapping['type'] == 'Direct'
+                             and mapping.get('source_column', BLANK_OPTION) in ('', BLANK_OPTION))},
+        'lookup_files': stored_paths
+    }
+    if source_columns is not None:
+        profile['source_columns'] = list(source_columns)
+        profile['header_signature'] = header_signature(source_columns)
+    
+    os.makedirs(base_dir, exist_ok=True)
+    with partial_output(profile_path) as partial_path:
+        with open(partial_path, 'w', encoding='utf-8') as f:
+            json.dump(profile, f, indent=2, ensure_ascii=False)
+
+
+def find_matching_profile(columns, profile_dir=PROFILE_DIR):
+    """Path of the most recently saved profile whose header signature matches columns, or None"""
+    if not os.path.isdir(profile_dir):
+        return None
+    signature = header_signature(columns)
+    candidates = [entry for entry in os.scandir(profile_dir)
+                  if entry.is_file() and entry.name.lower().endswith('.json')]
+    for entry in sorted(candidates, key=lambda entry: entry.stat().st_mtime, reverse=True):
+        try:
+            with open(entry.path, encoding='utf-8') as f:
+                if json.load(f).get('header_signature') == signature:
+                    return entry.path
+        except (OSError, ValueError, AttributeError):
+            continue
+    return None
+
+
+def expand_sources(paths):
+    """Expand folders (supported files inside) and glob patterns into source paths
+    
+    Plain paths that match nothing are kept so they get reported as missing.
+    """
+    sources = []
+    for path in paths:
+        if os.path.isdir(path):
+            sources.extend(sorted(os.path.join(path, name) for name in os.listdir(path)
+                                  if name.lower().endswith(SOURCE_EXTENSIONS)))
+        else:
+            matches = sorted(glob.glob(path))
+            sources.extend(matches if matches else [path])
+    return sources
+
+
+def warm_lookup_indexes(mappings, lookup_files):
+    """Build every lookup index (and value column) the mappings will use"""
+    lookup_groups = plan_lookups(mappings)
+    for lookup_file, columns in lookup_columns(lookup_groups).items():
+        if lookup_file in lookup_files:
+            ensure_lookup_columns(lookup_files[lookup_file], columns)
+    for (lookup_file, source_column, lookup_key, match_options), targets in lookup_groups.items():
+        if lookup_file in lookup_files:
+            lookup_index = get_lookup_index(lookup_files[lookup_file], lookup_key, match_options[0])
+            for asn_col, value_column, chain in targets:
+                lookup_index.values(value_column)
+        for asn_col, value_column, chain in targets:
+            for hop_file, hop_key, hop_value, hop_options in chain:
+                if hop_file in lookup_files:
+                    get_lookup_index(lookup_files[hop_file], hop_key, hop_options[0]).values(hop_value)
+
+
+def process_source_file(source_path, mappings, lookup_files, output_dir=None, output_format='xlsx',
+                        split_column=None, chunk_rows=None, split_workers=None, reject_invalid=False,
+                        output_path=None, progress=None, source_cache=None, asn_template=ASN_TEMPLATE,
+                        profiler=None):
+    """Generate the ASN template for one source file, returns its report entry
+    
+    The output goes to output_path (default_output_path() if None). With
+    chunk_rows the source is streamed in chunks of that many rows; with
+    split_column one file is written per distinct value of that ASN column.
+    The rows are checked by an AsnValidator and the summary stored under
+    'validation' (with the report CSV path when there are issues). With
+    reject_invalid a file with issues gets status 'invalid' and no ASN
+    output. The entry includes a RunProfiler report under 'profile'.
+    Failures are reported in the entry rather than raised.
+    
+    progress(phase, done, total) is passed on to each phase and may raise
+    GenerationCancelled, which is re-raised. The source is probed and
+    loaded through source_cache (a SourceCache) if given. A started
+    profiler records this run after whatever it already measured.
+    """
+    start = time.perf_counter()
+    result = {'source': source_path}
+    with nullcontext(profiler) if profiler is not None else RunProfiler() as profiler:
+        try:
+            output_path = output_path or default_output_path(source_path, output_dir, output_format)
+            # Compile against the header first so only the mapped columns are read
+            plan = compile_plan(mappings, probe_columns(source_path, source_cache), asn_template)
+            if split_column:
+                check_split_column(split_column, [asn_col for asn_col, operation, argument in plan.operations])
+            validator = AsnValidator(plan, asn_template, chunked=bool(chunk_rows))
+            report_base = output_path
+            if chunk_rows:
+                row_count, errors = stream_asn_file(source_path, plan, lookup_files, output_path, chunk_rows,
+                                                    progress=progress, profiler=profiler, validator=validator)
+                if reject_invalid and validator.has_issues:
+                    os.remove(output_path)
+            else:
+                with profiler.measure('load') as block:
+                    if source_cache is not None:
+                        source_df = source_cache.get(source_path, load_dataframe, plan.load_columns)
+                    else:
+                        source_df = load_dataframe(source_path, usecols=plan.load_columns)
+                    block['rows'] = len(source_df)
+                if progress:
+                    progress('Loading', len(source_df), len(source_df))
+                lookup_misses = {}
+                asn_df, errors = plan.execute(source_df, lookup_files, progress, profiler, lookup_misses)
+                with profiler.measure('validate') as block:
+                    block['rows'] = len(asn_df)
+                    validator.check(asn_df, lookup_misses)
+                if not (reject_invalid and validator.has_issues):
+                    with profiler.measure('write') as block:
+                        block['rows'] = len(asn_df)
+                        if split_column:
+                            output_path = write_split_outputs(asn_df, output_path, split_column, progress,
+                                                              max_workers=split_workers)
+                        else:
+                            write_output(asn_df, output_path, progress)
+                row_count = len(asn_df)
+            result.update({
+                'status': 'ok',
+                'output': output_path,
+                'rows': row_count,
+                'summary': plan.processing_summary,
+                'lookup_stats': plan.lookup_stats,
+                'errors': errors,
+                'validation': write_validation_report(validator, report_base)
+            })
+            if reject_invalid and validator.has_issues:
+                del result['output']
+                result.update({'status': 'invalid',
+                               'error': f"Validation failed, see {result['validation']['report']}"})
+        except GenerationCancelled:
+            raise
+        except Exception as e:
+            result.update({'status': 'error', 'error': str(e)})
+    result['seconds'] = round(time.perf_counter() - start, 3)
+    result['profile'] = profiler.report()
+    return result
+
+
+# Mapping configuration of a batch worker process, set once by _init_batch_worker
+_batch_state = {}
+
+
+def _init_batch_worker(mappings, lookup_files):
+    # Under spawn (Windows, and macOS by default) mappings and lookup_files are
+    # pickled into every worker, so each holds its own copy of the lookup data
+    # and indexes: memory grows with the worker count and startup pays one
+    # pickle round trip per worker. Only under fork are they inherited pages
+    # shared with the parent until written.
+    _batch_state['mappings'] = mappings
+    _batch_state['lookup_files'] = lookup_files
+
+
+def create_batch_pool(mappings, lookup_files, max_workers=None):
+    """Process pool whose workers hold one mapping configuration and its lookups
+    
+    Lookup indexes are built before the workers start, so they stay warm for
+    every file submitted with process_batch_file. Each worker receives its
+    own copy of the lookups (see _init_batch_worker), so with large lookup
+    files fewer workers may be faster than one per core.
+    """
+    warm_lookup_indexes(mappings, lookup_files)
+    return ProcessPoolExecutor(max_workers=max_workers or os.cpu_count() or 1,
+                               initializer=_init_batch_worker, initargs=(mappings, lookup_files))
+
+
+def process_batch_file(source_path, output_options):
+    """process_source_file inside a create_batch_pool worker (output_options as keywords)"""
+    return process_source_file(source_path, _batch_state['mappings'], _batch_state['lookup_files'],
+                               split_workers=1, **output_options)
+
+
+def run_batch(source_paths, mappings, lookup_files, output_dir=None, output_format='xlsx',
+              split_column=None, chunk_rows=None, max_workers=None, progress=None, run_log=None,
+              reject_invalid=False):
+    """Apply one mapping configuration to many source files in a process pool
+    
+    Lookup files are loaded by the caller once and their indexes are built
+    here before the workers start. progress('Batch', files done, file count)
+    is called as files finish and may raise GenerationCancelled, which
+    cancels files not yet started. A source given twice is processed once;
+    outputs that would share a name get a suffix (see batch_output_paths).
+    With reject_invalid, files that fail validation are not written and
+    count as failed. Each file's entry is appended to the run_log JSON-lines
+    file if given (by this process, so lines never interleave). Returns the
+    batch report: per-file entries (see process_source_file) plus aggregate
+    counts and timings.
+    """
+    start = time.perf_counter()
+    unique_sources = {}
+    for source_path in source_paths:
+        unique_sources.setdefault(os.path.normcase(os.path.abspath(source_path)), source_path)
+    source_paths = list(unique_sources.values())
+    output_paths = batch_output_paths(source_paths, output_dir, output_format)
+    output_options = {
+        'output_dir': output_dir,
+        'output_format': output_format,
+        'split_column': split_column,
+        'chunk_rows': chunk_rows,
+        'reject_invalid': reject_invalid
+    }
+    max_workers = max(1, min(max_workers or os.cpu_count() or 1, len(source_paths)))
+    
+    results = {}
+    if progress:
+        progress('Batch', 0, len(source_paths))
+    if max_workers == 1:
+        warm_lookup_indexes(mappings, lookup_files)
+        for source_path in source_paths:
+            results[source_path] = process_source_file(source_path, mappings, lookup_files,
+                                                        output_path=output_paths[source_path], **output_options)
+            if run_log:
+                append_run_log(run_log, results[source_path])
+            if progress:
+                progress('Batch', len(results), len(source_paths))
+    else:
+        executor = create_batch_pool(mappings, lookup_files, max_workers)
+        try:
+            futures = {executor.submit(process_batch_file, source_path,
+                                       dict(output_options, output_path=output_paths[source_path])): source_path
+                       for source_path in source_paths}
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+                if run_log:
+                    append_run_log(run_log, results[futures[future]])
+                if progress:
+                    progress('Batch', len(results), len(source_paths))
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+    
+    files = [results[source_path] for source_path in source_paths if source_path in results]
+    total_seconds = time.perf_counter() - start
+    total_rows = sum(result.get('rows', 0) for result in files)
+    return {
+        'files': files,
+        'succeeded': sum(1 for result in files if result['status'] == 'ok'),
+        'failed': sum(1 for result in files if result['status'] != 'ok'),
+        'total_rows': total_rows,
+        'workers': max_workers,
+        'total_seconds': round(total_seconds, 3),
+        'rows_per_second': round(total_rows / total_seconds) if total_seconds else 0
+    }
@@ -0,0 +1,256 @@
+"""Watch an inbound folder and generate ASN templates as source files land
+
+Usage:
+    python asn_watch.py --profile supplier.json --inbound inbound/ --output-dir outbound/
+
+Files are picked up once their size and modification time have been stable
+for --settle seconds (so half-copied files are skipped), processed by a
+bounded pool of worker processes that keep the lookup indexes warm, and
+then moved to the done or error folder. One JSON line per file is printed
+to stdout. Stop with Ctrl+C (or SIGTERM); files in progress are finished.
+Does not import tkinter.
+"""
+import argparse
+import json
+import os
+import shutil
+import signal
+import sys
+import threading
+import time
+import warnings
+warnings.filterwarnings('ignore')
+
+from asn_engine import DEFAULT_CHUNK_ROWS, OUTPUT_FORMATS, SOURCE_EXTENSIONS, load_profile, \
+    create_batch_pool, process_batch_file, append_run_log, batch_output_paths, check_split_column, LookupCache
+from asn_cli import parse_lookup_args, load_lookup_files
+
+
+class InboundWatcher:
+    """Polls inbound_dir and feeds settled source files to a worker pool"""
+
+    def __init__(self, inbound_dir, mappings, lookup_paths, output_options, done_dir, error_dir,
+                 max_workers=None, settle_seconds=2.0, poll_seconds=1.0, log=print, lookup_cache=None,
+                 run_log=None):
+        self.inbound_dir = inbound_dir
+        self.mappings = mappings
+        self.lookup_paths = lookup_paths
+        self.output_options = output_options
+        self.done_dir = done_dir
+        self.error_dir = error_dir
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.settle_seconds = settle_seconds
+        self.poll_seconds = poll_seconds
+        self.log = log
+        self.lookup_cache = lookup_cache
+        self.run_log = run_log
+        self.stop_event = threading.Event()
+
+        self.pending = {}  # path -> ((size, mtime_ns), first time seen with that signature)
+        self.in_flight = {}  # future -> path
+        self.in_flight_outputs = {}  # future -> output path, so concurrent files never share one
+        self.stuck = {}  # path -> signature of files that could not be moved away
+        self.executor = None
+        self.lookup_signature = None
+
+    def _file_signature(self, path):
+        stat = os.stat(path)
+        return (stat.st_size, stat.st_mtime_ns)
+
+    def _ensure_pool(self):
+        """(Re)start the worker pool, reloading lookups when any lookup file changed"""
+        signature = {}
+        for name, path in self.lookup_paths.items():
+            try:
+                signature[name] = self._file_signature(path)
+            except OSError:
+                signature[name] = None
+        if self.executor is not None and signature == self.lookup_signature:
+            return
+        if self.executor is not None:
+            self.log({'event': 'lookups_changed'})
+            self.executor.shutdown(wait=True)
+
+        lookup_files, statuses = load_lookup_files(self.lookup_paths, self.mappings, self.lookup_cache)
+        self.log({'event': 'lookups_loaded', 'lookup_files': statuses})
+        self.executor = create_batch_pool(self.mappings, lookup_files, self.max_workers)
+        self.lookup_signature = signature
+
+    def scan(self):
+        """Return inbound files whose size and mtime have been stable for settle_seconds"""
+        now = time.monotonic()
+        ready = []
+        seen = set()
+        for entry in os.scandir(self.inbound_dir):
+            name = entry.name
+            if not entry.is_file() or name.startswith(('~$', '.')) or not name.lower().endswith(SOURCE_EXTENSIONS):
+                continue
+            path = entry.path
+            seen.add(path)
+            if path in self.in_flight.values():
+                continue
+            try:
+                signature = self._file_signature(path)
+            except OSError:
+                continue
+            if self.stuck.get(path) == signature:
+                continue
+
+            previous = self.pending.get(path)
+            if previous is None or previous[0] != signature:
+                # New or still being written - restart the settle timer
+                self.pending[path] = (signature, now)
+            elif now - previous[1] >= self.settle_seconds:
+                ready.append(path)
+
+        # Forget files that disappeared before settling
+        for path in list(self.pending):
+            if path not in seen:
+                del self.pending[path]
+        return sorted(ready)
+
+    def _move(self, path, target_dir):
+        os.makedirs(target_dir, exist_ok=True)
+        target = os.path.join(target_dir, os.path.basename(path))
+        if os.path.exists(target):
+            base, ext = os.path.splitext(target)
+            target = f"{base}_{time.strftime('%Y%m%d_%H%M%S')}{ext}"
+        shutil.move(path, target)
+        return target
+
+    def _collect_finished(self):
+        for future in [future for future in self.in_flight if future.done()]:
+            path = self.in_flight.pop(future)
+            self.in_flight_outputs.pop(future, None)
+            self.pending.pop(path, None)
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {'source': path, 'status': 'error', 'error': str(e)}
+
+            target_dir = self.done_dir if result['status'] == 'ok' else self.error_dir
+            try:
+                result['moved_to'] = self._move(path, target_dir)
+            except OSError as e:
+                result['move_error'] = str(e)
+                try:
+                    self.stuck[path] = self._file_signature(path)
+                except OSError:
+                    pass  # Moved or deleted by someone else meanwhile
+            if result['status'] != 'ok' and 'moved_to' in result:
+                with open(result['moved_to'] + '.error.txt', 'w', encoding='utf-8') as f:
+                    f.write(result.get('error', ''))
+            if self.run_log:
+                append_run_log(self.run_log, result)
+            self.log(dict(result, event='processed'))
+
+    def run_once(self):
+        """One poll: collect finished files, then submit settled ones up to the pool size"""
+        self._collect_finished()
+        self._ensure_pool()
+        for path in self.scan():
+            if len(self.in_flight) >= self.max_workers:
+                break
+            # Outputs of earlier files stay in the output folder, never overwrite them
+            output_path = batch_output_paths([path], self.output_options['output_dir'],
+                                             self.output_options['output_format'],
+                                             taken=self.in_flight_outputs.values(), keep_existing=True)[path]
+            future = self.executor.submit(process_batch_file, path, dict(self.output_options, output_path=output_path))
+            self.in_flight[future] = path
+            self.in_flight_outputs[future] = output_path
+
+    def run(self, exit_when_idle=False):
+        """Poll until stop() (or, with exit_when_idle, until the inbound folder is drained)"""
+        try:
+            while not self.stop_event.is_set():
+                self.run_once()
+                if exit_when_idle and not self.in_flight and not self.pending:
+                    break
+                self.stop_event.wait(self.poll_seconds)
+        finally:
+            while self.in_flight:
+                time.sleep(0.1)
+                self._collect_finished()
+            if self.executor is not None:
+                self.executor.shutdown(wait=True)
+
+    def stop(self, *args):
+        self.stop_event.set()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate ASN templates for files dropped into a folder.")
+    parser.add_argument('--profile', required=True, help="mapping profile (JSON)")
+    parser.add_argument('--inbound', required=True, help="folder to watch for source files")
+    parser.add_argument('--lookup', action='append', default=[], metavar='NAME=PATH',
+                        help="lookup file, overrides the profile's path for NAME (repeatable)")
+    parser.add_argument('--output-dir', default=None, help="output directory (default: INBOUND/output)")
+    parser.add_argument('--done-dir', default=None, help="processed sources (default: INBOUND/done)")
+    parser.add_argument('--error-dir', default=None, help="failed sources (default: INBOUND/error)")
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='xlsx', help="output format (default: xlsx)")
+    parser.add_argument('--split-by', default=None, metavar='ASN_COLUMN',
+                        help="write one file per value of this ASN column, e.g. GenericKey")
+    parser.add_argument('--stream', action='store_true',
+                        help="low-memory mode: read, map and write each source in row chunks")
+    parser.add_argument('--reject-invalid', action='store_true',
+                        help="move sources that fail validation to the error folder without writing an ASN")
+    parser.add_argument('--jobs', type=int, default=None,
+                        help="worker processes (default: one per CPU core)")
+    parser.add_argument('--settle', type=float, default=2.0,
+                        help="seconds a file must stay unchanged before it is processed (default: 2)")
+    parser.add_argument('--poll', type=float, default=1.0, help="seconds between folder scans (default: 1)")
+    parser.add_argument('--once', action='store_true', help="process the files present, then exit")
+    parser.add_argument('--no-lookup-cache', action='store_true',
+                        help="always parse lookup files instead of using the on-disk lookup cache")
+    parser.add_argument('--run-log', default=None, metavar='FILE',
+                        help="append one JSON line per processed file (timings, memory, counts) to FILE")
+    args = parser.parse_args(argv)
+    if args.stream and (args.split_by or args.format == 'parquet'):
+        parser.error("--stream writes a single .xlsx or .csv file (no --split-by or parquet)")
+    try:
+        if args.split_by:
+            check_split_column(args.split_by)
+    except ValueError as e:
+        parser.error(str(e))
+    if not os.path.isdir(args.inbound):
+        parser.error(f"inbound folder not found: {args.inbound}")
+
+    try:
+        lookup_args = parse_lookup_args(args.lookup)
+        mappings, lookup_paths = load_profile(args.profile)
+    except (argparse.ArgumentTypeError, OSError, ValueError) as e:
+        parser.error(str(e))
+    lookup_paths.update(lookup_args)
+
+    output_dir = args.output_dir or os.path.join(args.inbound, 'output')
+    os.makedirs(output_dir, exist_ok=True)
+    output_options = {
+        'output_dir': output_dir,
+        'output_format': args.format,
+        'split_column': args.split_by,
+        'chunk_rows': DEFAULT_CHUNK_ROWS if args.stream else None,
+        'reject_invalid': args.reject_invalid
+    }
+
+    def log(record):
+        print(json.dumps(dict(record, time=time.strftime('%Y-%m-%dT%H:%M:%S')), default=str), flush=True)
+
+    watcher = InboundWatcher(args.inbound, mappings, lookup_paths, output_options,
+                             done_dir=args.done_dir or os.path.join(args.inbound, 'done'),
+                             error_dir=args.error_dir or os.path.join(args.inbound, 'error'),
+                             max_workers=args.jobs, settle_seconds=args.settle,
+                             poll_seconds=args.poll, log=log,
+                             lookup_cache=None if args.no_lookup_cache else LookupCache(),
+                             run_log=args.run_log)
+    signal.signal(signal.SIGINT, watcher.stop)
+    if hasattr(signal, 'SIGTERM'):
+        signal.signal(signal.SIGTERM, watcher.stop)
+
+    log({'event': 'watching', 'inbound': args.inbound, 'output_dir': output_dir})
+    watcher.run(exit_when_idle=args.once)
+    log({'event': 'stopped'})
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+"""Benchmark the ASN generation pipeline phase by phase on synthetic workloads
+
+Usage:
+    python benchmarks/bench_pipeline.py --rows 10000 100000 --formats csv xlsx
+    python benchmarks/bench_pipeline.py --rows 100000 --compare benchmarks/results/<earlier run>.json
+
+Times load, Direct, Multi-Select, Lookup, Manual Input, DataFrame assembly,
+validation and write for every workload (median and min over --repeat runs) and saves
+the results as JSON, tagged with the git commit, for comparison across
+commits. Generated files are kept in --work-dir and reused.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from statistics import median
+
+import numpy as np
+import pandas as pd
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+from asn_engine import OUTPUT_FORMATS, AsnValidator, RunProfiler, compile_plan, load_dataframe, load_lookup_file, \
+    lookup_columns, plan_lookups, probe_columns, warm_lookup_indexes, write_output
+from workload import WORKLOAD_FORMATS, make_mappings, workload_files, workload_params
+
+# Phases in pipeline order; MappingPlan.execute() times the ones from 'direct' to 'assemble'
+PHASES = ['lookup_load', 'load', 'direct', 'multi_select', 'lookup', 'manual_input', 'empty', 'assemble', 'validate', 'write']
+
+
+def git_commit():
+    """Short hash of HEAD (with '+dirty' for uncommitted changes), or None outside a git checkout"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCHMARK_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        status = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=BENCHMARK_DIR,
+                                capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ('+dirty' if status.strip() else '')
+
+
+def run_once(source_path, lookup_path, mappings, output_path):
+    """Run the pipeline once, returns ({phase: seconds}, rows)"""
+    with RunProfiler() as profiler:
+        with profiler.measure('lookup_load'):
+            needed_columns = lookup_columns(plan_lookups(mappings))
+            lookup_files = {'suppliers': load_lookup_file(lookup_path, columns=needed_columns['suppliers'])}
+            warm_lookup_indexes(mappings, lookup_files)
+
+        with profiler.measure('load'):
+            plan = compile_plan(mappings, probe_columns(source_path))
+            source_df = load_dataframe(source_path, usecols=plan.load_columns)
+
+        lookup_misses = {}
+        asn_df, errors = plan.execute(source_df, lookup_files, profiler=profiler, lookup_misses=lookup_misses)
+
+        with profiler.measure('validate'):
+            validator = AsnValidator(plan)
+            validator.check(asn_df, lookup_misses)
+            validator.report()
+
+        with profiler.measure('write'):
+            write_output(asn_df, output_path)
+
+    seconds = {phase: entry['seconds'] for phase, entry in profiler.report()['phases'].items()}
+    return seconds, len(asn_df)
+
+
+def run_workload(params, work_dir, output_format, repeat):
+    """Benchmark one workload, returns its results entry"""
+    start = time.perf_counter()
+    source_path, lookup_path = workload_files(params, work_dir)
+    generate_seconds = time.perf_counter() - start
+
+    mappings = make_mappings()
+    runs = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for run_number in range(repeat):
+            output_path = os.path.join(tmp_dir, f"asn_{run_number}.{output_format}")
+            seconds, rows = run_once(source_path, lookup_path, mappings, output_path)
+            runs.append(seconds)
+
+    phases = {}
+    for phase in PHASES:
+        values = [seconds[phase] for seconds in runs if phase in seconds]
+        if values:
+            phases[phase] = {'median': round(median(values), 4), 'min': round(min(values), 4)}
+    totals = [sum(seconds.values()) for seconds in runs]
+    return {
+        'params': dict(params, output_format=output_format),
+        'rows': rows,
+        'repeat': repeat,
+        'generate_seconds': round(generate_seconds, 3),
+        'phases': phases,
+        'total': {'median': round(median(totals), 4), 'min': round(min(totals), 4)},
+        'rows_per_second': round(rows / median(totals)),
+    }
+
+
+def print_workload(result, baseline=None):
+    params = result['params']
+    print(f"\n{params['rows']:,} rows x {params['columns']} columns  {params['file_format']} -> "
+          f"{params['output_format']}  keys: {params['key_cardinality']:,}  nulls: {params['null_ratio']:.0%}  "
+          f"({result['rows_per_second']:,} rows/sec)")
+    rows = list(result['phases'].items()) + [('total', result['total'])]
+    for phase, seconds in rows:
+        line = f"  {phase:<13} {seconds['median']:>9.4f}s  (min {seconds['min']:.4f}s)"
+        if baseline:
+            before = baseline['phases'].get(phase) if phase != 'total' else baseline['total']
+            if before and seconds['median'] > 0:
+                line += f"  was {before['median']:.4f}s  {before['median'] / seconds['median']:>5.2f}x"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[100000])
+    parser.add_argument('--columns', type=int, default=20, help="source columns (default: 20)")
+    parser.add_argument('--key-cardinality', type=int, default=5000, help="distinct lookup keys (default: 5000)")
+    parser.add_argument('--null-ratio', type=float, default=0.1, help="share of blank cells (default: 0.1)")
+    parser.add_argument('--miss-ratio', type=float, default=0.05,
+                        help="share of rows whose lookup key is missing from the master (default: 0.05)")
+    parser.add_argument('--formats', nargs='+', default=['csv'], choices=WORKLOAD_FORMATS,
+                        help="source and lookup file formats")
+    parser.add_argument('--output-format', choices=OUTPUT_FORMATS, default='xlsx')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--work-dir', default=os.path.join(tempfile.gettempdir(), 'asn_bench_workloads'),
+                        help="where generated files are kept between runs")
+    parser.add_argument('--output', default=None,
+                        help="results JSON (default: benchmarks/results/<time>_<commit>.json)")
+    parser.add_argument('--compare', default=None, metavar='RESULTS_JSON',
+                        help="earlier results to compare matching workloads against")
+    args = parser.parse_args()
+
+    baselines = {}
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            for result in json.load(f)['workloads']:
+                baselines[json.dumps(result['params'], sort_keys=True)] = result
+
+    commit = git_commit()
+    report = {
+        'commit': commit,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'machine': {'platform': platform.platform(), 'python': platform.python_version(),
+                    'pandas': pd.__version__, 'numpy': np.__version__, 'cpu_count': os.cpu_count()},
+        'workloads': [],
+    }
+    print(f"Commit: {commit or 'unknown'}  Python {platform.python_version()}  pandas {pd.__version__}")
+
+    for file_format in args.formats:
+        for rows in args.rows:
+            params = workload_params(rows, args.columns, args.key_cardinality, args.null_ratio,
+                                     args.miss_ratio, file_format, args.seed)
+            result = run_workload(params, args.work_dir, args.output_format, args.repeat)
+            report['workloads'].append(result)
+            print_workload(result, baselines.get(json.dumps(result['params'], sort_keys=True)))
+
+    output_path = args.output or os.path.join(
+        BENCHMARK_DIR, 'results', f"{time.strftime('%Y%m%d_%H%M%S')}_{(commit or 'unknown').replace('+', '_')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults: {output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Benchmark source/lookup file reader engines (see READER_ENGINES in asn_engine)
+
+Usage:
+    python benchmarks/bench_readers.py --rows 100000 --columns 40
+    python benchmarks/bench_readers.py --files inbound/shipment.xlsb masters/items.csv
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from asn_engine import load_dataframe, reader_engines, sniff_format
+
+
+def make_source(rows, columns, seed=0):
+    """Shipment-like frame: codes, quantities, dates and free text with blanks"""
+    rng = np.random.default_rng(seed)
+    source_data = {}
+    for position in range(columns):
+        kind = position % 4
+        if kind == 0:
+            values = np.char.add('SKU', rng.integers(0, 50000, rows).astype(str)).astype(object)
+        elif kind == 1:
+            values = rng.integers(1, 1000, rows)
+        elif kind == 2:
+            values = (pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 720, rows), unit='D')).strftime('%Y-%m-%d')
+        else:
+            values = np.where(rng.random(rows) < 0.3, None, np.char.add('Remark ', rng.integers(0, 100, rows).astype(str)))
+        source_data[f"Col{position}"] = values
+    return pd.DataFrame(source_data)
+
+
+def time_read(file_path, engine, usecols=None):
+    start = time.perf_counter()
+    df = load_dataframe(file_path, usecols=usecols, engine=engine)
+    return time.perf_counter() - start, df
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--columns', type=int, default=40)
+    parser.add_argument('--used-columns', type=int, default=8,
+                        help="columns read in the column-subset run, like a typical mapping (default: 8)")
+    parser.add_argument('--formats', nargs='+', default=['csv', 'xlsx'], choices=['csv', 'xlsx'],
+                        help="synthetic files to generate")
+    parser.add_argument('--files', nargs='+', default=None, help="benchmark these files instead")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        files = args.files
+        if not files:
+            source_df = make_source(args.rows, args.columns)
+            files = []
+            for file_format in args.formats:
+                file_path = os.path.join(tmp_dir, f"source.{file_format}")
+                start = time.perf_counter()
+                if file_format == 'csv':
+                    source_df.to_csv(file_path, index=False)
+                else:
+                    source_df.to_excel(file_path, index=False)
+                print(f"Generated {file_path} ({args.rows:,} rows x {args.columns} columns) "
+                      f"in {time.perf_counter() - start:.1f}s")
+                files.append(file_path)
+
+        for file_path in files:
+            file_format = sniff_format(file_path)
+            header = list(load_dataframe(file_path, nrows=0).columns)
+            usecols = header[::max(len(header) // args.used_columns, 1)][:args.used_columns]
+            size_mb = os.path.getsize(file_path) / 1024 ** 2
+            print(f"\n{os.path.basename(file_path)}  format: {file_format}  {size_mb:.1f} MB  "
+                  f"engines: {', '.join(reader_engines(file_format)) or 'none installed'}")
+
+            baseline = None
+            for engine in reader_engines(file_format):
+                for label, columns in (('all columns', None), (f"{len(usecols)} columns", usecols)):
+                    seconds, df = time_read(file_path, engine, columns)
+                    baseline = baseline or seconds
+                    print(f"  {engine:<10} {label:<12} {seconds:>8.2f}s {len(df) / seconds:>12,.0f} rows/sec "
+                          f"{baseline / seconds:>5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Benchmark ASN output writers (pandas to_excel vs streaming xlsx writers)
+
+Usage:
+    python benchmarks/bench_writers.py --rows 200000
+"""
+import argparse
+import importlib.util
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from asn_engine import ASN_TEMPLATE, constant_column, write_output
+
+
+def make_asn_frame(rows, mapped_columns=17, seed=0):
+    """ASN-shaped frame: a few mapped string/number columns, the rest constant"""
+    rng = np.random.default_rng(seed)
+    asn_data = {}
+    codes = np.zeros(rows, dtype=np.int8)
+    for position, asn_col in enumerate(ASN_TEMPLATE):
+        if position >= mapped_columns:
+            asn_data[asn_col] = constant_column("", rows, codes)
+        elif position % 3 == 0:
+            asn_data[asn_col] = rng.integers(0, 10000, rows)
+        else:
+            asn_data[asn_col] = np.char.add('V', rng.integers(0, 50000, rows).astype(str)).astype(object)
+    return pd.DataFrame(asn_data)
+
+
+def available_engines():
+    engines = ['pandas', 'openpyxl']
+    if importlib.util.find_spec('xlsxwriter') is not None:
+        engines.append('xlsxwriter')
+    return engines
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--mapped-columns', type=int, default=17)
+    parser.add_argument('--engines', nargs='+', default=available_engines(),
+                        help="pandas (to_excel), openpyxl (write-only), xlsxwriter (constant_memory)")
+    args = parser.parse_args()
+
+    asn_df = make_asn_frame(args.rows, args.mapped_columns)
+    print(f"Rows: {args.rows:,}  Columns: {len(asn_df.columns)}  Mapped: {args.mapped_columns}")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        baseline = None
+        for engine in args.engines:
+            output_path = os.path.join(tmp_dir, f"{engine}.xlsx")
+            start = time.perf_counter()
+            write_output(asn_df, output_path, engine=engine)
+            seconds = time.perf_counter() - start
+            baseline = baseline or seconds
+            size_mb = os.path.getsize(output_path) / 1024 ** 2
+            print(f"{engine:<12} {seconds:>8.2f}s {args.rows / seconds:>12,.0f} rows/sec "
+                  f"{size_mb:>8.1f} MB  {baseline / seconds:>5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Synthetic ASN workloads: shipment source files, a lookup master and mappings
+
+Everything is derived from the parameters and seed, so the same workload
+can be regenerated on another machine or commit. Used by bench_pipeline.py.
+"""
+import hashlib
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from asn_engine import write_output
+
+# Formats the generator can write (.xlsb has no Python writer - pass a real file to the benchmark instead)
+WORKLOAD_FORMATS = ['csv', 'xlsx']
+
+# Columns every source has; 'columns' beyond these are filler text columns
+BASE_COLUMNS = ['SKU', 'Batch', 'Lot', 'Expiry', 'Supplier', 'Qty', 'PO', 'Pallet']
+
+
+def workload_params(rows=100000, columns=20, key_cardinality=5000, null_ratio=0.1, miss_ratio=0.05,
+                    file_format='csv', seed=0):
+    """Parameter dict describing one workload (the input to every function below)"""
+    if file_format not in WORKLOAD_FORMATS:
+        raise ValueError(f"Cannot generate {file_format} files (supported: {', '.join(WORKLOAD_FORMATS)})")
+    return {'rows': rows, 'columns': max(columns, len(BASE_COLUMNS)), 'key_cardinality': key_cardinality,
+            'null_ratio': null_ratio, 'miss_ratio': miss_ratio, 'file_format': file_format, 'seed': seed}
+
+
+def _with_nulls(values, null_ratio, rng):
+    values = np.asarray(values, dtype=object)
+    values[rng.random(len(values)) < null_ratio] = None
+    return values
+
+
+def make_source(params):
+    """Shipment lines: codes, quantities and dates with null_ratio blanks
+
+    Supplier draws from key_cardinality lookup keys; miss_ratio of the rows
+    use codes that are not in the lookup.
+    """
+    rng = np.random.default_rng(params['seed'])
+    rows = params['rows']
+    null_ratio = params['null_ratio']
+
+    suppliers = np.char.add('SUP', rng.integers(0, params['key_cardinality'], rows).astype(str)).astype(object)
+    misses = rng.random(rows) < params['miss_ratio']
+    suppliers[misses] = np.char.add('NEW', rng.integers(0, 1000, misses.sum()).astype(str))
+    expiry = pd.Timestamp('2025-01-01') + pd.to_timedelta(rng.integers(0, 720, rows), unit='D')
+
+    source_data = {
+        'SKU': np.char.add('SKU', rng.integers(0, params['key_cardinality'] * 10, rows).astype(str)),
+        'Batch': _with_nulls(rng.integers(1000, 9999, rows).astype(str), null_ratio, rng),
+        'Lot': _with_nulls(np.char.add('L', rng.integers(0, 100000, rows).astype(str)), null_ratio, rng),
+        'Expiry': _with_nulls(expiry.strftime('%Y-%m-%d'), null_ratio, rng),
+        'Supplier': _with_nulls(suppliers, null_ratio, rng),
+        'Qty': rng.integers(1, 500, rows),
+        'PO': np.char.add('PO', (np.arange(rows) // 50).astype(str)),
+        'Pallet': np.char.add('LPN', rng.integers(0, rows // 20 + 1, rows).astype(str)),
+    }
+    for position in range(len(BASE_COLUMNS), params['columns']):
+        source_data[f"Extra{position}"] = _with_nulls(
+            np.char.add('Remark ', rng.integers(0, 200, rows).astype(str)), null_ratio, rng)
+    return pd.DataFrame(source_data)
+
+
+def make_lookup(params):
+    """Supplier master: one row per key with owner and description"""
+    rng = np.random.default_rng(params['seed'] + 1)
+    keys = np.arange(params['key_cardinality'])
+    return pd.DataFrame({
+        'Code': np.char.add('SUP', keys.astype(str)),
+        'Owner': np.char.add('OWN', (keys % 97).astype(str)),
+        'Description': np.char.add('Supplier ', rng.integers(0, 10 ** 6, len(keys)).astype(str)),
+    })
+
+
+def make_mappings():
+    """Mappings touching every operation type: Direct, Multi-Select, Lookup and Manual Input"""
+    def lookup(value_column):
+        return {'type': 'Lookup', 'lookup_config': {'lookup_file': 'suppliers', 'source_column': 'Supplier',
+                                                    'lookup_key': 'Code', 'lookup_value': value_column}}
+    return {
+        'Item:': {'type': 'Direct', 'source_column': 'SKU'},
+        'Expected Qty:': {'type': 'Direct', 'source_column': 'Qty'},
+        'LPN:': {'type': 'Direct', 'source_column': 'Pallet'},
+        'Purchase Order': {'type': 'Direct', 'source_column': 'PO'},
+        'LOTTABLE01': {'type': 'Multi-Select', 'selections': ['Batch', 'Lot']},
+        'LOTTABLE02': {'type': 'Multi-Select', 'selections': ['Lot', 'Expiry', 'Batch']},
+        'Owner': lookup('Owner'),
+        'LOTTABLE03': lookup('Description'),
+        'Hold Code:': {'type': 'Manual Input', 'value': 'OK'},
+        'Location:': {'type': 'Manual Input', 'value': 'STAGE'},
+    }
+
+
+def workload_files(params, work_dir):
+    """Write (or reuse) the workload's source and lookup files, returns (source_path, lookup_path)
+
+    File names carry a hash of params, so a workload is generated once per
+    work_dir and reused by later runs.
+    """
+    digest = hashlib.sha1(json.dumps(params, sort_keys=True).encode('utf-8')).hexdigest()[:10]
+    source_path = os.path.join(work_dir, f"source_{digest}.{params['file_format']}")
+    lookup_path = os.path.join(work_dir, f"suppliers_{digest}.{params['file_format']}")
+    os.makedirs(work_dir, exist_ok=True)
+    for path, make in ((source_path, make_source), (lookup_path, make_lookup)):
+        if not os.path.exists(path):
+            write_output(make(params), path)
+    return source_path, lookup_path
@@ -1,11 +1,27 @@
-import pandas as pd
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import os
+import json
+import queue
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, wait
 from typing import Dict, List, Tuple, Optional
 import warnings
 warnings.filterwarnings('ignore')
 
+from asn_engine import (ASN_TEMPLATE, MULTI_SELECT_COLUMNS, BLANK_OPTION, DEFAULT_CHUNK_ROWS,
+                        OUTPUT_FORMATS, SPLIT_COLUMNS, SourceCache, GenerationCancelled,
+                        probe_columns, load_lookup_file, copy_lookup_file, default_output_path,
+                        process_source_file,
+                        expand_sources, run_batch, PROFILE_DIR, load_profile, save_profile,
+                        find_matching_profile, match_profile_columns, plan_lookups, lookup_columns,
+                        lookup_memory_usage, warm_lookup_indexes, RunProfiler, append_run_log, RUN_LOG_PATH,
+                        LookupCache, NORMALIZE_STEPS, MATCH_MODES, DEFAULT_FUZZY_CUTOFF)
+
+NO_SPLIT_OPTION = "-- Single file --"
+
 class ASNTemplateMapper:
     def __init__(self):
         self.root = tk.Tk()
@@ -13,85 +29,22 @@ class ASNTemplateMapper:
         self.root.geometry("900x700")
         
         # ASN Template columns with their mapping requirements (1=required, 0=optional/hidden)
-        self.asn_template = {
-            "Messages": 0,
-            "GenericKey": 1,
-            "HIDDEN ASN/Receipt:": 0,
-            "Item:": 1,
-            "Owner": 1,
-            "Line #:": 0,
-            "Expected Qty:": 1,
-            "Received Qty:": 0,
-            "UOM:": 0,
-            "Pack:": 0,
-            "LPN:": 1,
-            "Location:": 1,
-            "Purchase Order": 0,
-            "Hold Code:": 1,
-            "HIDDEN Status:": 0,
-            "LOTTABLE01": 1,
-            "LOTTABLE02": 1,
-            "LOTTABLE03": 1,
-            "LOTTABLE04": 0,
-            "LOTTABLE05": 0,
-            "LOTTABLE06": 1,
-            "LOTTABLE07": 1,
-            "LOTTABLE08": 0,
-            "LOTTABLE09": 1,
-            "LOTTABLE10": 0,
-            "LOTTABLE11": 0,
-            "LOTTABLE12": 0,
-            "Container Reference:": 0,
-            "CUBE": 0,
-            "Gross Weight:": 0,
-            "Net Weight:": 0,
-            "Tare Weight:": 0,
-            "Temperature": 0,
-            "Received Date:": 0,
-            "DISPOSITIONCODE": 0,
-            "DISPOSITIONTYPE": 0,
-            "Transaction Override Date:": 0,
-            "Extended Price:": 0,
-            "EXTERNALLOT": 0,
-            "External Line #:": 0,
-            "External ASN #:": 0,
-            "ID": 0,
-            "MatchLottable": 0,
-            "Notes:": 0,
-            "Packing:": 0,
-            "POLINENUMBER": 0,
-            "QC Auto Adjust:": 0,
-            "Inspected:": 0,
-            "Rejected:": 0,
-            "Reject Reason:": 0,
-            "QC Required:": 0,
-            "QC Status:": 0,
-            "QCUSER": 0,
-            "QTYADJUSTED": 0,
-            "QTYREJECTED": 0,
-            "Reason Code:": 0,
-            "RETURNCONDITION": 0,
-            "RETURNREASON": 0,
-            "RETURNTYPE": 0,
-            "RMA Number:": 0,
-            "SupplierKey": 0,
-            "Ship From Name": 0,
-            "UDF1:": 1,
-            "UDF2:": 1,
-            "UDF3:": 1,
-            "UDF4:": 1,
-            "UDF5:": 0
-        }
+        self.asn_template = dict(ASN_TEMPLATE)
         
         self.source_file_path = None
         self.source_columns = []
         self.column_mappings = {}
-        self.lookup_files = {}  # Store lookup reference files
-        self.multi_select_columns = [
-            "LOTTABLE01", "LOTTABLE02", "LOTTABLE03", "LOTTABLE04", "LOTTABLE05",
-            "LOTTABLE06", "LOTTABLE07", "LOTTABLE08", "LOTTABLE09", "LOTTABLE10",
-            "LOTTABLE11", "LOTTABLE12", "UDF1:", "UDF2:", "UDF3:", "UDF4:", "UDF5:"
-        ]
+        self.lookup_files = {}  # Store lookup reference files; entries are swapped, never loaded in place
+        self.lookup_cache = LookupCache()  # Lookup columns/indexes kept on disk across sessions
+        self.lookup_executor = ThreadPoolExecutor(max_workers=1)  # Background lookup loading
+        self.lookup_loads = {}  # Lookup name -> future of its background load
+        self.lookup_errors = {}  # Lookup name -> last background load error
+        self.source_cache = SourceCache()  # Parsed source files, reused across generations
+        self.worker = None  # Background generation thread
+        self.cancel_event = threading.Event()
+        self.progress_queue = queue.Queue()
+        self.phase_started = {}  # Progress phase -> start time, for ETA
+        self.multi_select_columns = list(MULTI_SELECT_COLUMNS)
         self.setup_ui()
         
     def setup_ui(self):
@@ -109,6 +62,18 @@ class ASNTemplateMapper:
         self.file_label = ttk.Label(file_frame, text="No file selected")
         self.file_label.grid(row=0, column=1, sticky=tk.W)
         
+        # Mapping profiles
+        profile_frame = ttk.Frame(file_frame)
+        profile_frame.grid(row=1, column=0, columnspan=2, sticky=tk.W, pady=(5, 0))
+        
+        ttk.Button(profile_frame, text="Load Profile...", 
+                  command=self.load_profile_dialog).pack(side=tk.LEFT, padx=(0, 5))
+        ttk.Button(profile_frame, text="Save Profile...", 
+                  command=self.save_profile_dialog).pack(side=tk.LEFT, padx=(0, 10))
+        
+        self.profile_label = ttk.Label(profile_frame, text="No profile", foreground="gray")
+        self.profile_label.pack(side=tk.LEFT)
+        
         # Lookup files frame
         lookup_frame = ttk.LabelFrame(main_frame, text="Lookup Reference Files", padding="5")
         lookup_frame.grid(row=1, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(0, 10))
@@ -146,11 +111,51 @@ class ASNTemplateMapper:
         control_frame = ttk.Frame(main_frame)
         control_frame.grid(row=3, column=0, columnspan=2, pady=(10, 0))
         
-        ttk.Button(control_frame, text="Generate ASN Template", 
-                  command=self.generate_template).grid(row=0, column=0, padx=(0, 10))
+        self.generate_button = ttk.Button(control_frame, text="Generate ASN Template", 
+                                          command=self.generate_template)
+        self.generate_button.grid(row=0, column=0, padx=(0, 10))
+        
+        self.batch_button = ttk.Button(control_frame, text="Batch Process Folder...", 
+                                       command=self.batch_process_folder)
+        self.batch_button.grid(row=0, column=1, padx=(0, 10))
         
         ttk.Button(control_frame, text="Reset Mappings", 
-                  command=self.reset_mappings).grid(row=0, column=1)
+                  command=self.reset_mappings).grid(row=0, column=2, padx=(0, 10))
+        
+        self.cancel_button = ttk.Button(control_frame, text="Cancel", 
+                                        command=self.cancel_generation, state=tk.DISABLED)
+        self.cancel_button.grid(row=0, column=3, padx=(0, 10))
+        
+        # Streaming keeps memory bounded for sources larger than RAM
+        self.streaming_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(control_frame, text="Low-memory streaming", 
+                        variable=self.streaming_var).grid(row=0, column=4)
+        
+        # Output options
+        output_frame = ttk.Frame(control_frame)
+        output_frame.grid(row=1, column=0, columnspan=5, pady=(10, 0), sticky=tk.W)
+        
+        ttk.Label(output_frame, text="Output format:").pack(side=tk.LEFT, padx=(0, 5))
+        self.format_combo = ttk.Combobox(output_frame, values=OUTPUT_FORMATS, state="readonly", width=8)
+        self.format_combo.set(OUTPUT_FORMATS[0])
+        self.format_combo.pack(side=tk.LEFT, padx=(0, 15))
+        
+        ttk.Label(output_frame, text="Split by:").pack(side=tk.LEFT, padx=(0, 5))
+        self.split_combo = ttk.Combobox(output_frame, values=[NO_SPLIT_OPTION] + SPLIT_COLUMNS, 
+                                        state="readonly", width=18)
+        self.split_combo.set(NO_SPLIT_OPTION)
+        self.split_combo.pack(side=tk.LEFT, padx=(0, 15))
+        
+        # Timings and memory of each run, appended to RUN_LOG_PATH
+        self.run_log_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(output_frame, text="Write run log", 
+                        variable=self.run_log_var).pack(side=tk.LEFT)
+        
+        # Generation progress
+        self.progress_bar = ttk.Progressbar(control_frame, length=400, mode="determinate")
+        self.progress_bar.grid(row=2, column=0, columnspan=5, pady=(10, 0), sticky=(tk.W, tk.E))
+        self.progress_label = ttk.Label(control_frame, text="", foreground="gray")
+        self.progress_label.grid(row=3, column=0, columnspan=5, sticky=tk.W)
         
         # Configure grid weights
         self.root.columnconfigure(0, weight=1)
@@ -190,17 +195,16 @@ class ASNTemplateMapper:
             
             if lookup_name:
                 try:
-                    # Load the lookup file to get column information
-                    lookup_df = self.load_dataframe(file_path)
-                    self.lookup_files[lookup_name] = {
-                        'path': file_path,
-                        'columns': list(lookup_df.columns),
-                        'df': lookup_df
-                    }
-                    self.update_lookup_label()
-                    messagebox.showinfo("Success", f"Lookup file '{lookup_name}' added successfully!")
+                    # Header only, so the lookup dialog can list the columns right away
+                    self.lookup_files[lookup_name] = load_lookup_file(file_path, columns=[],
+                                                                      cache=self.lookup_cache)
                 except Exception as e:
                     messagebox.showerror("Error", f"Failed to load lookup file: {str(e)}")
+                    return
+                self.lookup_errors.pop(lookup_name, None)
+                # Data for lookups already configured against this name loads in the background
+                self.preload_lookups(self.collect_mappings(), [lookup_name])
+                messagebox.showinfo("Success", f"Lookup file '{lookup_name}' added successfully!")
     
     def manage_lookup_files(self):
         """Manage existing lookup files"""
@@ -221,8 +225,8 @@ class ASNTemplateMapper:
         ttk.Label(main_frame, text="Loaded Lookup Files:", font=("Arial", 10, "bold")).pack(anchor=tk.W, pady=(0, 10))
         
         listbox = tk.Listbox(main_frame, height=10)
-        for name, info in self.lookup_files.items():
-            listbox.insert(tk.END, f"{name} ({len(info['columns'])} columns)")
+        for name in self.lookup_files:
+            listbox.insert(tk.END, self.describe_lookup_file(name))
         listbox.pack(fill=tk.BOTH, expand=True, pady=(0, 10))
         
         # Buttons
@@ -237,35 +241,125 @@ class ASNTemplateMapper:
                 listbox.delete(selection[0])
                 self.update_lookup_label()
         
+        def reload_selected():
+            selection = listbox.curselection()
+            if selection:
+                name = list(self.lookup_files.keys())[selection[0]]
+                info = self.lookup_files[name]
+                try:
+                    # Fresh entry and no cached copy, so the file is parsed again
+                    self.lookup_cache.clear(info['path'])
+                    self.lookup_files[name] = load_lookup_file(info['path'], columns=[],
+                                                               cache=self.lookup_cache)
+                except Exception as e:
+                    messagebox.showerror("Error", f"Failed to reload lookup file: {str(e)}")
+                    return
+                self.lookup_errors.pop(name, None)
+                self.preload_lookups(self.collect_mappings(), [name])
+                listbox.delete(selection[0])
+                listbox.insert(selection[0], self.describe_lookup_file(name))
+        
         ttk.Button(button_frame, text="Remove Selected", command=remove_selected).pack(side=tk.LEFT)
+        def clear_cache():
+            removed = self.lookup_cache.clear()
+            messagebox.showinfo("Info", f"Removed {removed} cached lookup entries.", parent=dialog)
+        
+        ttk.Button(button_frame, text="Reload Selected", command=reload_selected).pack(side=tk.LEFT, padx=(5, 0))
+        ttk.Button(button_frame, text="Clear Index Cache", command=clear_cache).pack(side=tk.LEFT, padx=(5, 0))
         ttk.Button(button_frame, text="Close", command=dialog.destroy).pack(side=tk.RIGHT)
     
+    def describe_lookup_file(self, name):
+        """One-line description of a lookup file, its memory use and built indexes"""
+        info = self.lookup_files[name]
+        loaded = 0 if info['df'] is None else len(info['df'].columns)
+        text = (f"{name} ({loaded} of {len(info['columns'])} columns loaded, "
+                f"{lookup_memory_usage(info) / 1024 ** 2:.1f} MB)")
+        for index in info['indexes'].values():
+            key_text = "+".join(index.key_column) if isinstance(index.key_column, tuple) else index.key_column
+            if index.normalize:
+                key_text += f" [{', '.join(index.normalize)}]"
+            text += (f" | index on {key_text}: {len(index.keys):,} keys, "
+                     f"{index.nbytes / 1024 ** 2:.1f} MB, built in {index.build_seconds:.2f}s")
+        return text
+    
     def update_lookup_label(self):
         """Update the lookup files label"""
         count = len(self.lookup_files)
         if count == 0:
             self.lookup_label.config(text="No lookup files loaded")
-        else:
-            self.lookup_label.config(text=f"{count} lookup file(s) loaded")
-    
-    def load_dataframe(self, file_path):
-        """Load DataFrame from various file formats"""
-        file_ext = os.path.splitext(file_path)[1].lower()
-        
-        if file_ext == '.csv':
-            return pd.read_csv(file_path)
-        elif file_ext == '.xls':
-            return pd.read_excel(file_path, engine='xlrd')
-        elif file_ext == '.xlsb':
-            return pd.read_excel(file_path, engine='pyxlsb')
-        elif file_ext == '.xlsx':
-            return pd.read_excel(file_path, engine='openpyxl')
-        else:
-            # Try to read as Excel first, then CSV
-            try:
-                return pd.read_excel(file_path)
-            except:
-                return pd.read_csv(file_path)
+            return
+        text = f"{count} lookup file(s) loaded"
+        loading = [name for name in self.lookup_loads if name in self.lookup_files]
+        if loading:
+            text += f" - loading {', '.join(loading)}..."
+        failed = [name for name in self.lookup_errors if name in self.lookup_files]
+        if failed:
+            text += f" - failed: {', '.join(failed)}"
+        self.lookup_label.config(text=text)
+    
+    def preload_lookups(self, mappings, names=None):
+        """Load and index, in the background, the lookup data the given mappings use
+        
+        The loader works on a copy of the entry, swapped in by
+        poll_lookup_loads, so the Tk thread and running generations never
+        see an entry change while they read it.
+        """
+        was_idle = not self.lookup_loads
+        for name in lookup_columns(plan_lookups(mappings)):
+            if name not in self.lookup_files or (names is not None and name not in names):
+                continue
+            future = self.lookup_executor.submit(self.load_lookup_copy, mappings, name, self.lookup_files[name])
+            self.lookup_loads[name] = future
+        self.update_lookup_label()
+        if was_idle and self.lookup_loads:
+            self.root.after(200, self.poll_lookup_loads)
+    
+    def load_lookup_copy(self, mappings, name, lookup_info):
+        """Background side of preload_lookups, returns (lookup_info, loaded copy of it)"""
+        loaded = copy_lookup_file(lookup_info)
+        warm_lookup_indexes(mappings, {name: loaded})
+        return lookup_info, loaded
+    
+    def poll_lookup_loads(self):
+        """Swap in finished background lookup loads and track them in the lookup label"""
+        for name, future in list(self.lookup_loads.items()):
+            if future.done():
+                del self.lookup_loads[name]
+                if future.exception() is not None:
+                    self.lookup_errors[name] = str(future.exception())
+                else:
+                    self.lookup_errors.pop(name, None)
+                    lookup_info, loaded = future.result()
+                    # Unless the file was removed or reloaded meanwhile
+                    if self.lookup_files.get(name) is lookup_info:
+                        self.lookup_files[name] = loaded
+        self.update_lookup_label()
+        if self.lookup_loads:
+            self.root.after(200, self.poll_lookup_loads)
+    
+    def pending_lookup_loads(self, mappings):
+        """Background loads of the lookup files the mappings use, {name: future}"""
+        needed = lookup_columns(plan_lookups(mappings))
+        return {name: future for name, future in self.lookup_loads.items() if name in needed}
+    
+    def wait_for_lookups(self, lookup_files, lookup_loads, progress):
+        """Block the worker until the given background lookup loads finish
+        
+        Returns copies of lookup_files for the worker to use (and load
+        further), taken from the finished loads where there are any.
+        """
+        for done_count, name in enumerate(lookup_loads):
+            while not wait([lookup_loads[name]], timeout=0.2).done:
+                progress(f"Loading lookup '{name}'", done_count, len(lookup_loads))
+        
+        snapshot = {}
+        for name, lookup_info in lookup_files.items():
+            future = lookup_loads.get(name)
+            # Failed loads are retried (and reported) by the lookups themselves
+            if future is not None and future.exception() is None and future.result()[0] is lookup_info:
+                lookup_info = future.result()[1]
+            snapshot[name] = copy_lookup_file(lookup_info)
+        return snapshot
     
     def select_source_file(self):
         file_path = filedialog.askopenfilename(
@@ -283,11 +377,12 @@ class ASNTemplateMapper:
             self.file_label.config(text=os.path.basename(file_path))
             self.load_source_columns()
             self.create_mapping_interface()
+            self.auto_apply_profile()
     
     def load_source_columns(self):
         try:
-            df = self.load_dataframe(self.source_file_path)
-            self.source_columns = list(df.columns)
+            # Header only - the full sheet is parsed later by generate_template
+            self.source_columns = probe_columns(self.source_file_path, self.source_cache)
         except Exception as e:
             messagebox.showerror("Error", f"Failed to read source file: {str(e)}")
             self.source_columns = []
@@ -379,10 +474,10 @@ class ASNTemplateMapper:
     def create_direct_mapping(self, asn_col):
         """Create direct column mapping"""
         mapping_info = self.column_mappings[asn_col]
-        source_options = ["-- Leave Blank --"] + self.source_columns
+        source_options = [BLANK_OPTION] + self.source_columns
         combobox = ttk.Combobox(mapping_info['config_frame'], values=source_options, 
                                state="readonly", width=30)
-        combobox.set("-- Leave Blank --")
+        combobox.set(BLANK_OPTION)
         combobox.pack(side=tk.LEFT)
         
         mapping_info['config_widgets']['combobox'] = combobox
@@ -524,18 +619,7 @@ class ASNTemplateMapper:
         def save_selections():
             selected_columns = [selected_listbox.get(i) for i in range(selected_listbox.size())]
             self.column_mappings[asn_col]['config_widgets']['selections'] = selected_columns
-            
-            # Update label
-            if selected_columns:
-                display_text = " | ".join(selected_columns)
-                if len(display_text) > 50:
-                    display_text = display_text[:47] + "..."
-                self.column_mappings[asn_col]['config_widgets']['label'].config(
-                    text=display_text, foreground="black")
-            else:
-                self.column_mappings[asn_col]['config_widgets']['label'].config(
-                    text="None selected", foreground="gray")
-            
+            self.update_selections_label(asn_col)
             dialog.destroy()
         
         def clear_all():
@@ -553,7 +637,7 @@ class ASNTemplateMapper:
         
         dialog = tk.Toplevel(self.root)
         dialog.title(f"Configure Lookup for {asn_col}")
-        dialog.geometry("500x400")
+        dialog.geometry("640x720")
         dialog.transient(self.root)
         dialog.grab_set()
         
@@ -589,6 +673,66 @@ class ASNTemplateMapper:
         lookup_value_combo = ttk.Combobox(main_frame, state="readonly", width=40)
         lookup_value_combo.pack(fill=tk.X, pady=(0, 10))
         
+        # Composite key: more (source column, lookup key column) pairs matched together
+        ttk.Label(main_frame, text="Additional Key Columns (optional, source → lookup key):").pack(
+            anchor=tk.W, pady=(0, 5))
+        extra_key_combos = []
+        for pair_number in range(2):
+            pair_frame = ttk.Frame(main_frame)
+            pair_frame.pack(fill=tk.X, pady=(0, 5))
+            extra_source_combo = ttk.Combobox(pair_frame, values=[""] + self.source_columns, 
+                                              state="readonly", width=28)
+            extra_source_combo.pack(side=tk.LEFT, padx=(0, 5))
+            ttk.Label(pair_frame, text="→").pack(side=tk.LEFT, padx=(0, 5))
+            extra_key_combo = ttk.Combobox(pair_frame, state="readonly", width=28)
+            extra_key_combo.pack(side=tk.LEFT)
+            extra_key_combos.append((extra_source_combo, extra_key_combo))
+        
+        # Chained lookup: look the value up again in another file
+        ttk.Label(main_frame, text="Then Look Up the Value In (optional, file / key / value):").pack(
+            anchor=tk.W, pady=(5, 5))
+        chain_frame = ttk.Frame(main_frame)
+        chain_frame.pack(fill=tk.X, pady=(0, 10))
+        chain_file_combo = ttk.Combobox(chain_frame, values=[""] + lookup_files, state="readonly", width=18)
+        chain_file_combo.pack(side=tk.LEFT, padx=(0, 5))
+        chain_key_combo = ttk.Combobox(chain_frame, state="readonly", width=18)
+        chain_key_combo.pack(side=tk.LEFT, padx=(0, 5))
+        chain_value_combo = ttk.Combobox(chain_frame, state="readonly", width=18)
+        chain_value_combo.pack(side=tk.LEFT)
+        
+        def update_chain_columns(event=None):
+            selected_file = chain_file_combo.get()
+            columns = self.lookup_files[selected_file]['columns'] if selected_file in self.lookup_files else []
+            chain_key_combo['values'] = columns
+            chain_value_combo['values'] = columns
+            chain_key_combo.set("")
+            chain_value_combo.set("")
+        
+        chain_file_combo.bind('<<ComboboxSelected>>', update_chain_columns)
+        
+        # Key matching: normalization applied to both sides, then the match mode
+        ttk.Label(main_frame, text="Key Matching:").pack(anchor=tk.W, pady=(0, 5))
+        normalize_frame = ttk.Frame(main_frame)
+        normalize_frame.pack(fill=tk.X, pady=(0, 5))
+        normalize_labels = {'text': "Ignore type (1001 = \"1001\")", 'strip': "Trim spaces", 
+                            'casefold': "Ignore case", 'leading_zeros': "Ignore leading zeros"}
+        normalize_vars = {}
+        for step in NORMALIZE_STEPS:
+            normalize_vars[step] = tk.BooleanVar(value=False)
+            ttk.Checkbutton(normalize_frame, text=normalize_labels[step], 
+                            variable=normalize_vars[step]).pack(side=tk.LEFT, padx=(0, 5))
+        
+        match_frame = ttk.Frame(main_frame)
+        match_frame.pack(fill=tk.X, pady=(0, 10))
+        ttk.Label(match_frame, text="Match:").pack(side=tk.LEFT, padx=(0, 5))
+        match_combo = ttk.Combobox(match_frame, values=MATCH_MODES, state="readonly", width=10)
+        match_combo.set(MATCH_MODES[0])
+        match_combo.pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Label(match_frame, text="Fuzzy cutoff (0-1):").pack(side=tk.LEFT, padx=(0, 5))
+        cutoff_entry = ttk.Entry(match_frame, width=6)
+        cutoff_entry.insert(0, str(DEFAULT_FUZZY_CUTOFF))
+        cutoff_entry.pack(side=tk.LEFT)
+        
         # Update lookup columns when file changes
         def update_lookup_columns(event=None):
             selected_file = file_combo.get()
@@ -599,6 +743,9 @@ class ASNTemplateMapper:
                 if columns:
                     lookup_key_combo.set(columns[0])
                     lookup_value_combo.set(columns[0])
+                for extra_source_combo, extra_key_combo in extra_key_combos:
+                    extra_key_combo['values'] = [""] + columns
+                    extra_key_combo.set("")
         
         file_combo.bind('<<ComboboxSelected>>', update_lookup_columns)
         update_lookup_columns()  # Initialize
@@ -609,10 +756,31 @@ class ASNTemplateMapper:
             if current_config['lookup_file'] in lookup_files:
                 file_combo.set(current_config['lookup_file'])
                 update_lookup_columns()
-            if current_config['source_column'] in self.source_columns:
-                source_combo.set(current_config['source_column'])
-            lookup_key_combo.set(current_config.get('lookup_key', ''))
+            source_columns = current_config['source_column']
+            lookup_keys = current_config.get('lookup_key', '')
+            if not isinstance(source_columns, list):
+                source_columns, lookup_keys = [source_columns], [lookup_keys]
+            if source_columns[0] in self.source_columns:
+                source_combo.set(source_columns[0])
+            lookup_key_combo.set(lookup_keys[0])
+            for (extra_source_combo, extra_key_combo), source_column, lookup_key in zip(
+                    extra_key_combos, source_columns[1:], lookup_keys[1:]):
+                extra_source_combo.set(source_column)
+                extra_key_combo.set(lookup_key)
             lookup_value_combo.set(current_config.get('lookup_value', ''))
+            if current_config.get('chain'):
+                hop = current_config['chain'][0]
+                if hop['lookup_file'] in lookup_files:
+                    chain_file_combo.set(hop['lookup_file'])
+                    update_chain_columns()
+                    chain_key_combo.set(hop['lookup_key'])
+                    chain_value_combo.set(hop['lookup_value'])
+            for step in current_config.get('normalize', []):
+                if step in normalize_vars:
+                    normalize_vars[step].set(True)
+            match_combo.set(current_config.get('match', MATCH_MODES[0]))
+            cutoff_entry.delete(0, tk.END)
+            cutoff_entry.insert(0, str(current_config.get('fuzzy_cutoff', DEFAULT_FUZZY_CUTOFF)))
         
         # Buttons
         button_frame = ttk.Frame(main_frame)
@@ -632,40 +800,207 @@ class ASNTemplateMapper:
                 messagebox.showerror("Error", "Please fill in all configuration fields.")
                 return
             
-            self.column_mappings[asn_col]['config_widgets']['lookup_config'] = config
+            # Composite key - every extra pair needs both columns
+            source_columns, lookup_keys = [config['source_column']], [config['lookup_key']]
+            for extra_source_combo, extra_key_combo in extra_key_combos:
+                if bool(extra_source_combo.get()) != bool(extra_key_combo.get()):
+                    messagebox.showerror("Error", "Each additional key needs a source column and a lookup key column.")
+                    return
+                if extra_source_combo.get():
+                    source_columns.append(extra_source_combo.get())
+                    lookup_keys.append(extra_key_combo.get())
+            if len(source_columns) > 1:
+                config['source_column'], config['lookup_key'] = source_columns, lookup_keys
             
-            # Update label
-            display_text = f"{config['source_column']} → {config['lookup_file']}.{config['lookup_value']}"
-            if len(display_text) > 50:
-                display_text = display_text[:47] + "..."
-            self.column_mappings[asn_col]['config_widgets']['label'].config(
-                text=display_text, foreground="black")
+            # Chained lookup (hops after the first one are kept from a loaded profile)
+            if chain_file_combo.get():
+                if not (chain_key_combo.get() and chain_value_combo.get()):
+                    messagebox.showerror("Error", "Please select the key and value columns of the chained lookup.")
+                    return
+                previous_chain = (current_config or {}).get('chain') or []
+                config['chain'] = [{'lookup_file': chain_file_combo.get(),
+                                    'lookup_key': chain_key_combo.get(),
+                                    'lookup_value': chain_value_combo.get()}] + previous_chain[1:]
             
+            # Matching options are only stored when they differ from exact matching
+            normalize = [step for step in NORMALIZE_STEPS if normalize_vars[step].get()]
+            if normalize:
+                config['normalize'] = normalize
+            if match_combo.get() != MATCH_MODES[0]:
+                config['match'] = match_combo.get()
+            if match_combo.get() == 'fuzzy':
+                try:
+                    cutoff = float(cutoff_entry.get())
+                except ValueError:
+                    cutoff = -1
+                if not 0 < cutoff <= 1:
+                    messagebox.showerror("Error", "Fuzzy cutoff must be a number between 0 and 1.")
+                    return
+                config['fuzzy_cutoff'] = cutoff
+            
+            self.column_mappings[asn_col]['config_widgets']['lookup_config'] = config
+            self.update_lookup_config_label(asn_col)
             dialog.destroy()
+            
+            # Start reading the key and value columns while the rest is configured. All
+            # mappings are passed, so the reload keeps the columns other lookups of the
+            # same files need
+            names = [config['lookup_file']] + [hop['lookup_file'] for hop in config.get('chain', [])]
+            self.preload_lookups(self.collect_mappings(), names)
         
         ttk.Button(button_frame, text="Cancel", command=dialog.destroy).pack(side=tk.RIGHT, padx=(5, 0))
         ttk.Button(button_frame, text="Save", command=save_config).pack(side=tk.RIGHT)
     
-    def perform_lookup(self, source_df, lookup_config):
-        """Perform lookup operation"""
-        try:
-            lookup_file_info = self.lookup_files[lookup_config['lookup_file']]
-            lookup_df = lookup_file_info['df']
+    def update_selections_label(self, asn_col):
+        """Show the Multi-Select columns of asn_col in its label"""
+        config_widgets = self.column_mappings[asn_col]['config_widgets']
+        selected_columns = config_widgets['selections']
+        if selected_columns:
+            display_text = " | ".join(selected_columns)
+            if len(display_text) > 50:
+                display_text = display_text[:47] + "..."
+            config_widgets['label'].config(text=display_text, foreground="black")
+        else:
+            config_widgets['label'].config(text="None selected", foreground="gray")
+    
+    def update_lookup_config_label(self, asn_col):
+        """Show the lookup configuration of asn_col in its label"""
+        config_widgets = self.column_mappings[asn_col]['config_widgets']
+        config = config_widgets['lookup_config']
+        source_text = "+".join(config['source_column']) if isinstance(config['source_column'], list) \
+            else config['source_column']
+        display_text = f"{source_text} → {config['lookup_file']}.{config['lookup_value']}"
+        for hop in config.get('chain') or []:
+            display_text += f" → {hop['lookup_file']}.{hop['lookup_value']}"
+        if config.get('normalize') or config.get('match', 'exact') != 'exact':
+            display_text += " ~"  # Normalized or fuzzy key matching
+        if len(display_text) > 50:
+            display_text = display_text[:47] + "..."
+        config_widgets['label'].config(text=display_text, foreground="black")
+    
+    def apply_mappings(self, mappings):
+        """Set the mapping widgets from plain mapping data (the collect_mappings format)"""
+        self.reset_mappings()
+        for asn_col, mapping in mappings.items():
+            if asn_col not in self.column_mappings:
+                continue
+            mapping_info = self.column_mappings[asn_col]
+            mapping_info['type_combo'].set(mapping.get('type', 'Direct'))
+            self.on_mapping_type_change(asn_col)
+            config_widgets = mapping_info['config_widgets']
             
-            # Create lookup dictionary
-            lookup_dict = dict(zip(
-                lookup_df[lookup_config['lookup_key']], 
-                lookup_df[lookup_config['lookup_value']]
-            ))
+            if 'combobox' in config_widgets:
+                source_column = mapping.get('source_column')
+                if source_column in self.source_columns:
+                    config_widgets['combobox'].set(source_column)
+            if 'selections' in config_widgets:
+                config_widgets['selections'] = [col for col in mapping.get('selections', [])
+                                                if col in self.source_columns]
+                self.update_selections_label(asn_col)
+            if 'lookup_config' in config_widgets and mapping.get('lookup_config'):
+                config_widgets['lookup_config'] = dict(mapping['lookup_config'])
+                self.update_lookup_config_label(asn_col)
+            if 'entry' in config_widgets:
+                config_widgets['entry'].insert(0, mapping.get('value', ''))
+    
+    def apply_profile(self, profile_path, auto_matched=False):
+        """Load a profile's lookup files and mappings into the UI"""
+        try:
+            mappings, lookup_paths = load_profile(profile_path)
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to load profile: {str(e)}")
+            return
+        # Profiles match headers regardless of case, so use the source's spelling
+        mappings = match_profile_columns(mappings, self.source_columns)
+        
+        failed = []
+        for name, path in lookup_paths.items():
+            loaded = self.lookup_files.get(name)
+            if loaded and os.path.abspath(loaded['path']) == os.path.abspath(path):
+                continue
+            try:
+                # Header now, the columns the profile uses in the background
+                self.lookup_files[name] = load_lookup_file(path, columns=[], cache=self.lookup_cache)
+                self.lookup_errors.pop(name, None)
+            except Exception as e:
+                failed.append(f"{name}: {str(e)}")
+        self.apply_mappings(mappings)
+        self.preload_lookups(mappings)
+        
+        profile_name = os.path.splitext(os.path.basename(profile_path))[0]
+        suffix = " (matched by header)" if auto_matched else ""
+        self.profile_label.config(text=f"Profile: {profile_name}{suffix}", foreground="black")
+        if failed:
+            messagebox.showwarning("Warning", "Some lookup files could not be loaded:\n" + "\n".join(failed))
+    
+    def auto_apply_profile(self):
+        """Apply the saved profile whose header signature matches the source, if any"""
+        self.profile_label.config(text="No profile", foreground="gray")
+        if not self.source_columns:
+            return
+        profile_path = find_matching_profile(self.source_columns)
+        if profile_path:
+            self.apply_profile(profile_path, auto_matched=True)
+    
+    def load_profile_dialog(self):
+        """Pick a saved mapping profile and apply it"""
+        if not self.column_mappings:
+            messagebox.showerror("Error", "Please select a source file first.")
+            return
+        profile_path = filedialog.askopenfilename(
+            title="Load Mapping Profile",
+            initialdir=PROFILE_DIR if os.path.isdir(PROFILE_DIR) else None,
+            filetypes=[("Mapping profiles", "*.json"), ("All files", "*.*")]
+        )
+        if profile_path:
+            self.apply_profile(profile_path)
+    
+    def save_profile_dialog(self):
+        """Save the current mappings and lookup files as a profile"""
+        if not self.column_mappings:
+            messagebox.showerror("Error", "Please select a source file first.")
+            return
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        initial_name = os.path.splitext(os.path.basename(self.source_file_path))[0]
+        profile_path = filedialog.asksaveasfilename(
+            title="Save Mapping Profile",
+            initialdir=PROFILE_DIR,
+            initialfile=f"{initial_name}.json",
+            defaultextension=".json",
+            filetypes=[("Mapping profiles", "*.json")]
+        )
+        if not profile_path:
+            return
+        
+        lookup_paths = {name: info['path'] for name, info in self.lookup_files.items()}
+        try:
+            save_profile(profile_path, self.collect_mappings(), lookup_paths, self.source_columns)
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to save profile: {str(e)}")
+            return
+        profile_name = os.path.splitext(os.path.basename(profile_path))[0]
+        self.profile_label.config(text=f"Profile: {profile_name}", foreground="black")
+        messagebox.showinfo("Success", f"Profile saved to:\n{profile_path}\n\n"
+                                       "Sources with the same columns will use it automatically.")
+    
+    def collect_mappings(self):
+        """Read the mapping configuration out of the widgets as plain data"""
+        mappings = {}
+        for asn_col, mapping_info in self.column_mappings.items():
+            config_widgets = mapping_info['config_widgets']
+            mapping = {'type': mapping_info['current_type']}
             
-            # Perform lookup
-            source_values = source_df[lookup_config['source_column']]
-            result = source_values.map(lookup_dict).fillna('')
+            if 'combobox' in config_widgets:
+                mapping['source_column'] = config_widgets['combobox'].get()
+            if 'selections' in config_widgets:
+                mapping['selections'] = list(config_widgets['selections'])
+            if config_widgets.get('lookup_config'):
+                mapping['lookup_config'] = dict(config_widgets['lookup_config'])
+            if 'entry' in config_widgets:
+                mapping['value'] = config_widgets['entry'].get()
             
-            return result.values
-        except Exception as e:
-            messagebox.showerror("Lookup Error", f"Failed to perform lookup: {str(e)}")
-            return [""] * len(source_df)
+            mappings[asn_col] = mapping
+        return mappings
     
     def reset_mappings(self):
         """Reset all mappings to default state"""
@@ -686,122 +1021,315 @@ class ASNTemplateMapper:
         if not self.source_file_path:
             messagebox.showerror("Error", "Please select a source file first.")
             return
+        if self.worker and self.worker.is_alive():
+            return
+        
+        output_options = self.get_output_options()
+        if output_options is None:
+            return
+        streaming, output_format, split_column = output_options
         
         # Ask for output file location
-        from datetime import datetime
-        date_str = datetime.now().strftime("%Y%m%d")
-        ref_name = os.path.splitext(os.path.basename(self.source_file_path))[0]
-        output_path = os.path.join(os.getcwd(), f"{date_str}_{ref_name}.xlsx")
+        output_path = default_output_path(self.source_file_path, output_format=output_format)
+        
+        # Snapshot the configuration on the Tk thread; the worker never touches widgets
+        mappings = self.collect_mappings()
+        self.start_worker(self.run_generation,
+                          (self.source_file_path, output_path, mappings, dict(self.lookup_files),
+                           streaming, split_column, self.pending_lookup_loads(mappings),
+                           RUN_LOG_PATH if self.run_log_var.get() else None),
+                          "Loading source file...")
+    
+    def get_output_options(self):
+        """(streaming, output format, split column) from the controls, None if they conflict"""
+        streaming = self.streaming_var.get()
+        split_column = self.split_combo.get()
+        split_column = None if split_column == NO_SPLIT_OPTION else split_column
+        output_format = self.format_combo.get()
+        if streaming and (split_column or output_format == 'parquet'):
+            messagebox.showerror("Error", "Low-memory streaming writes a single .xlsx or .csv file.\n"
+                                          "Turn it off to split output or write Parquet.")
+            return None
+        return streaming, output_format, split_column
+    
+    def start_worker(self, target, args, status_text):
+        """Run target(*args) on a background thread and start polling its progress"""
+        self.cancel_event = threading.Event()
+        self.progress_queue = queue.Queue()
+        self.worker = threading.Thread(target=target, args=args, daemon=True)
+        
+        self.generate_button.config(state=tk.DISABLED)
+        self.batch_button.config(state=tk.DISABLED)
+        self.cancel_button.config(state=tk.NORMAL)
+        self.progress_bar.config(mode="indeterminate")
+        self.progress_bar.start(10)
+        self.progress_label.config(text=status_text)
+        self.phase_started = {}
+        
+        self.worker.start()
+        self.root.after(100, self.poll_generation)
+    
+    def batch_process_folder(self):
+        """Apply the current mappings to every source file in a folder"""
+        if self.worker and self.worker.is_alive():
+            return
+        if not self.column_mappings:
+            messagebox.showerror("Error", "Please select a source file and configure the mappings first.")
+            return
+        
+        output_options = self.get_output_options()
+        if output_options is None:
+            return
+        streaming, output_format, split_column = output_options
+        
+        folder = filedialog.askdirectory(title="Select Folder of Source Files")
+        if not folder:
+            return
+        source_paths = expand_sources([folder])
+        if not source_paths:
+            messagebox.showinfo("Info", "No supported source files found in the selected folder.")
+            return
+        
+        mappings = self.collect_mappings()
+        self.start_worker(self.run_batch_generation,
+                          (source_paths, mappings, dict(self.lookup_files), output_format,
+                           split_column, streaming, self.pending_lookup_loads(mappings),
+                           RUN_LOG_PATH if self.run_log_var.get() else None),
+                          f"Processing {len(source_paths)} files...")
+    
+    def run_batch_generation(self, source_paths, mappings, lookup_files, output_format,
+                             split_column=None, streaming=False, lookup_loads=None, run_log=None):
+        """Run a folder batch on the worker thread, reporting through progress_queue"""
+        def progress(phase, done, total):
+            if self.cancel_event.is_set():
+                raise GenerationCancelled()
+            self.progress_queue.put(('progress', phase, done, total))
         
         try:
-            # Load source data
-            source_df = self.load_dataframe(self.source_file_path)
-            
-            # Create ASN template DataFrame
-            asn_data = {}
-            processing_summary = {
-                'direct': 0,
-                'multi_select': 0,
-                'lookup': 0,
-                'manual_input': 0,
-                'empty': 0
-            }
-            
-            # Process each ASN column
-            for asn_col in self.asn_template.keys():
-                if asn_col in self.column_mappings:
-                    mapping_info = self.column_mappings[asn_col]
-                    mapping_type = mapping_info['current_type']
-                    
-                    if mapping_type == "Direct":
-                        # Direct column mapping
-                        combobox = mapping_info['config_widgets'].get('combobox')
-                        if combobox:
-                            selected = combobox.get()
-                            if selected != "-- Leave Blank --" and selected in source_df.columns:
-                                asn_data[asn_col] = source_df[selected].values
-                                processing_summary['direct'] += 1
-                            else:
-                                asn_data[asn_col] = [""] * len(source_df)
-                                processing_summary['empty'] += 1
-                        else:
-                            asn_data[asn_col] = [""] * len(source_df)
-                            processing_summary['empty'] += 1
-                    
-                    elif mapping_type == "Multi-Select":
-                        # Multi-select mapping
-                        selected_columns = mapping_info['config_widgets'].get('selections', [])
-                        if selected_columns:
-                            combined_values = []
-                            for index in range(len(source_df)):
-                                values = []
-                                for source_col in selected_columns:
-                                    if source_col in source_df.columns:
-                                        value = str(source_df[source_col].iloc[index])
-                                        if value and value not in ['nan', 'None', 'NaN']:
-                                            values.append(value)
-                                combined_values.append("|".join(values) if values else "")
-                            asn_data[asn_col] = combined_values
-                            processing_summary['multi_select'] += 1
-                        else:
-                            asn_data[asn_col] = [""] * len(source_df)
-                            processing_summary['empty'] += 1
-                    
-                    elif mapping_type == "Lookup":
-                        # Lookup mapping
-                        lookup_config = mapping_info['config_widgets'].get('lookup_config')
-                        if lookup_config:
-                            lookup_values = self.perform_lookup(source_df, lookup_config)
-                            asn_data[asn_col] = lookup_values
-                            processing_summary['lookup'] += 1
-                        else:
-                            asn_data[asn_col] = [""] * len(source_df)
-                            processing_summary['empty'] += 1
-                    
-                    elif mapping_type == "Manual Input":
-                        entry = mapping_info['config_widgets'].get('entry')
-                        if entry:
-                            manual_value = entry.get()
-                            asn_data[asn_col] = [manual_value] * len(source_df)
-                            processing_summary['manual_input'] = processing_summary.get('manual_input', 0) + 1
-                        else:
-                            asn_data[asn_col] = [""] * len(source_df)
-                            processing_summary['empty'] += 1
-                    
-                    else:
-                        asn_data[asn_col] = [""] * len(source_df)
-                        processing_summary['empty'] += 1
-                else:
-                    # Fill with empty values for unmapped columns
-                    asn_data[asn_col] = [""] * len(source_df)
-                    processing_summary['empty'] += 1
-            
-            # Create DataFrame and save
-            asn_df = pd.DataFrame(asn_data)
-            asn_df.to_excel(output_path, index=False)
-            
-            # Show success message with detailed summary
-            total_mapped = processing_summary['direct'] + processing_summary['multi_select'] + processing_summary['lookup']
-            messagebox.showinfo("Success", 
-                              f"ASN template generated successfully!\n\n"
-                              f"Output: {output_path}\n"
-                              f"Rows processed: {len(asn_df):,}\n"
-                              f"Total ASN columns: {len(self.asn_template)}\n\n"
-                              f"Mapping Summary:\n"
-                              f"• Direct mappings: {processing_summary['direct']}\n"
-                              f"• Multi-select mappings: {processing_summary['multi_select']}\n"
-                              f"• Manual input mappings: {processing_summary['manual_input']}\n"
-                              f"• Lookup mappings: {processing_summary['lookup']}\n"
-                              f"• Empty/unmapped: {processing_summary['empty']}\n"
-                              f"• Total mapped: {total_mapped}")
-            
+            lookup_files = self.wait_for_lookups(lookup_files, lookup_loads or {}, progress)
+            batch_report = run_batch(source_paths, mappings, lookup_files,
+                                     output_format=output_format,
+                                     split_column=split_column,
+                                     chunk_rows=DEFAULT_CHUNK_ROWS if streaming else None,
+                                     progress=progress,
+                                     run_log=run_log)
+            self.progress_queue.put(('batch_done', batch_report))
+        except GenerationCancelled:
+            self.progress_queue.put(('cancelled',))
         except Exception as e:
-            messagebox.showerror("Error", f"Failed to generate template: {str(e)}")
-            import traceback
-            print(traceback.format_exc())  # For debugging
+            self.progress_queue.put(('error', str(e), traceback.format_exc()))
+    
+    def run_generation(self, source_path, output_path, mappings, lookup_files,
+                       streaming=False, split_column=None, lookup_loads=None, run_log=None):
+        """Generate with process_source_file on the worker thread, reporting through progress_queue
+        
+        Waiting for background lookup loads is timed as 'lookup_load' in the
+        same RunProfiler; with run_log the result entry is also appended
+        there as a JSON line.
+        """
+        def progress(phase, done, total):
+            if self.cancel_event.is_set():
+                raise GenerationCancelled()
+            self.progress_queue.put(('progress', phase, done, total))
+        
+        start = time.perf_counter()
+        try:
+            with RunProfiler() as profiler:
+                # Only the lookups these mappings use are waited for
+                with profiler.measure('lookup_load'):
+                    lookup_files = self.wait_for_lookups(lookup_files, lookup_loads or {}, progress)
+                result = process_source_file(source_path, mappings, lookup_files, output_path=output_path,
+                                             split_column=split_column,
+                                             chunk_rows=DEFAULT_CHUNK_ROWS if streaming else None,
+                                             progress=progress, source_cache=self.source_cache,
+                                             asn_template=self.asn_template, profiler=profiler)
+        except GenerationCancelled:
+            self.progress_queue.put(('cancelled',))
+            return
+        result['seconds'] = round(time.perf_counter() - start, 3)
+        
+        if run_log:
+            try:
+                append_run_log(run_log, result)
+            except OSError as e:
+                self.progress_queue.put(('warning', "Run Log", f"Could not write run log {run_log}: {e}"))
+        if result['status'] == 'ok':
+            self.progress_queue.put(('done', result['output'], result['rows'], result['summary'],
+                                     result['errors'], result['lookup_stats'], result['profile'],
+                                     result['validation']))
+        else:
+            self.progress_queue.put(('error', result['error'], None))
+    
+    def poll_generation(self):
+        """Drain worker messages into the progress bar, rescheduling until it finishes"""
+        finished = None
+        try:
+            while True:
+                message = self.progress_queue.get_nowait()
+                if message[0] == 'progress':
+                    self.show_progress(*message[1:])
+                elif message[0] == 'warning':
+                    messagebox.showwarning(message[1], message[2])
+                else:
+                    finished = message
+        except queue.Empty:
+            pass
+        
+        if finished is None:
+            self.root.after(100, self.poll_generation)
+            return
+        
+        self.progress_bar.stop()
+        self.progress_bar.config(mode="determinate", value=0)
+        self.generate_button.config(state=tk.NORMAL)
+        self.batch_button.config(state=tk.NORMAL)
+        self.cancel_button.config(state=tk.DISABLED)
+        
+        if finished[0] == 'done':
+            self.progress_label.config(text="")
+            self.show_generation_summary(*finished[1:])
+        elif finished[0] == 'batch_done':
+            self.progress_label.config(text="")
+            self.show_batch_summary(finished[1])
+        elif finished[0] == 'cancelled':
+            self.progress_label.config(text="Generation cancelled")
+        else:
+            self.progress_label.config(text="")
+            messagebox.showerror("Error", f"Failed to generate template: {finished[1]}")
+            if finished[2]:
+                print(finished[2])  # For debugging
+    
+    def show_progress(self, phase, done, total):
+        """Show phase, items processed and an ETA for the current phase"""
+        now = time.perf_counter()
+        started = self.phase_started.setdefault(phase, now)
+        
+        if total is None:
+            # Streaming doesn't know the row count up front
+            self.progress_bar.config(mode="indeterminate")
+            self.progress_bar.start(10)
+            rate = done / max(now - started, 1e-9)
+            self.progress_label.config(text=f"{phase}: {done:,} rows ({rate:,.0f} rows/s)")
+            return
+        
+        self.progress_bar.stop()
+        self.progress_bar.config(mode="determinate", maximum=max(total, 1), value=done)
+        text = f"{phase}: {done:,} / {total:,}"
+        if 0 < done < total:
+            eta = (now - started) / done * (total - done)
+            text += f" (ETA {eta:.0f}s)"
+        self.progress_label.config(text=text)
+    
+    def cancel_generation(self):
+        """Ask the worker to stop at its next progress report"""
+        self.cancel_event.set()
+        self.cancel_button.config(state=tk.DISABLED)
+        self.progress_label.config(text="Cancelling...")
+    
+    def show_generation_summary(self, output_path, row_count, processing_summary, errors, lookup_stats=None,
+                                profile=None, validation=None):
+        """Report lookup errors and the mapping summary of a finished generation"""
+        for error in errors:
+            messagebox.showerror("Lookup Error", error)
+        
+        if isinstance(output_path, list):
+            # Split output - one file per ASN
+            output_path = f"{len(output_path)} files in {os.path.dirname(output_path[0]) if output_path else os.getcwd()}"
+        
+        # Show success message with detailed summary
+        total_mapped = processing_summary['direct'] + processing_summary['multi_select'] + processing_summary['lookup']
+        has_issues = bool(validation and (validation['rows_with_issues'] or validation['column_issues']))
+        show = messagebox.showwarning if has_issues else messagebox.showinfo
+        show("Generated With Validation Issues" if has_issues else "Success",
+             f"ASN template generated successfully!\n\n"
+             f"Output: {output_path}\n"
+             f"Rows processed: {row_count:,}\n"
+             f"Total ASN columns: {len(self.asn_template)}\n\n"
+             f"Mapping Summary:\n"
+             f"• Direct mappings: {processing_summary['direct']}\n"
+             f"• Multi-select mappings: {processing_summary['multi_select']}\n"
+             f"• Manual input mappings: {processing_summary['manual_input']}\n"
+             f"• Lookup mappings: {processing_summary['lookup']}\n"
+             f"• Empty/unmapped: {processing_summary['empty']}\n"
+             f"• Total mapped: {total_mapped}"
+             f"{self.format_validation(validation)}"
+             f"{self.format_lookup_stats(lookup_stats)}"
+             f"{self.format_profile(profile)}")
+    
+    def format_validation(self, validation, max_issues=5):
+        """Rows with issues, the most frequent issues and the report path, for the summary"""
+        if not validation or 'report' not in validation:
+            return ""
+        lines = [f"\n\nValidation: {validation['rows_with_issues']:,} of {validation['rows']:,} rows have issues"]
+        lines.extend(f"• {issue}" for issue in validation['column_issues'][:max_issues])
+        issues = sorted(validation['issues'].items(), key=lambda item: -item[1])[:max_issues]
+        lines.extend(f"• {issue}: {count:,} rows" for issue, count in issues)
+        lines.append(f"Report: {validation['report']}")
+        return "\n".join(lines)
+    
+    def format_lookup_stats(self, lookup_stats):
+        """Matched/unmatched key counts per lookup, for the generation summary"""
+        if not lookup_stats:
+            return ""
+        lines = ["\n\nLookup Matches:"]
+        for label, entry in lookup_stats.items():
+            line = f"• {label}: {entry['matched']:,} matched, {entry['unmatched']:,} unmatched"
+            if entry['blank']:
+                line += f", {entry['blank']:,} blank"
+            if entry['unmatched_examples']:
+                line += f" (e.g. {', '.join(entry['unmatched_examples'][:3])})"
+            lines.append(line)
+        return "\n".join(lines)
+    
+    def format_profile(self, profile, max_columns=5):
+        """Time, rows/sec and peak memory per phase plus the slowest columns, for the summary"""
+        if not profile:
+            return ""
+        def memory(entry):
+            return f", {entry['peak_memory_mb']:,.0f} MB" if entry.get('peak_memory_mb') is not None else ""
+        
+        lines = [f"\n\nTiming: {profile['total_seconds']:.1f}s total{memory(profile)} peak"]
+        for phase, entry in profile['phases'].items():
+            line = f"• {phase}: {entry['seconds']:.2f}s"
+            if entry['rows_per_second']:
+                line += f" ({entry['rows_per_second']:,} rows/s{memory(entry)})"
+            lines.append(line)
+        
+        columns = list(profile['columns'].items())[:max_columns]
+        if columns:
+            lines.append("Slowest columns:")
+            lines.extend(f"• {column}: {entry['seconds']:.2f}s" for column, entry in columns)
+        return "\n".join(lines)
+    
+    def show_batch_summary(self, batch_report):
+        """Save the batch report as JSON and show the aggregate results"""
+        from datetime import datetime
+        report_path = os.path.join(os.getcwd(), f"batch_report_{datetime.now():%Y%m%d_%H%M%S}.json")
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(batch_report, f, indent=2, default=str)
+        
+        failed = [f"• {os.path.basename(result['source'])}: {result['error']}"
+                  for result in batch_report['files'] if result['status'] != 'ok']
+        invalid = [f"• {os.path.basename(result['source'])}: {result['validation']['rows_with_issues']:,} rows"
+                   for result in batch_report['files'] if 'report' in result.get('validation', {})]
+        message = (f"Batch finished.\n\n"
+                   f"Files generated: {batch_report['succeeded']}\n"
+                   f"Files failed: {batch_report['failed']}\n"
+                   f"Rows processed: {batch_report['total_rows']:,}\n"
+                   f"Time: {batch_report['total_seconds']:.1f}s "
+                   f"({batch_report['rows_per_second']:,} rows/sec, {batch_report['workers']} workers)\n\n"
+                   f"Report: {report_path}")
+        if invalid:
+            message += "\n\nValidation issues (see each _validation.csv):\n" + "\n".join(invalid[:10])
+        if failed:
+            messagebox.showwarning("Batch Finished", message + "\n\nFailed files:\n" + "\n".join(failed[:10]))
+        else:
+            messagebox.showinfo("Batch Finished", message)
     
     def run(self):
         self.root.mainloop()
+        # Don't keep the process alive for lookups nobody will use
+        self.lookup_executor.shutdown(wait=False, cancel_futures=True)
 
 # Add missing import for simpledialog
 import tkinter.simpledialog
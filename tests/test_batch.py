@@ -0,0 +1,65 @@
+import os
+
+import pandas as pd
+import pytest
+
+from asn_engine import batch_output_paths, check_split_column, run_batch, write_split_outputs
+
+MAPPINGS = {
+    'Item:': {'type': 'Direct', 'source_column': 'SKU'},
+    'Expected Qty:': {'type': 'Direct', 'source_column': 'Qty'},
+    'Hold Code:': {'type': 'Manual Input', 'value': 'OK'},
+}
+
+
+def write_source(path, skus):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    pd.DataFrame({'SKU': skus, 'Qty': range(1, len(skus) + 1)}).to_csv(path, index=False)
+    return str(path)
+
+
+def test_batch_output_paths_suffix_colliding_names(tmp_path):
+    sources = [str(tmp_path / 'a' / 'ship.csv'), str(tmp_path / 'b' / 'ship.csv'), str(tmp_path / 'a' / 'ship.xlsx')]
+    output_paths = batch_output_paths(sources, str(tmp_path / 'out'))
+
+    names = [os.path.basename(output_paths[source]) for source in sources]
+    assert names[0].endswith('_ship.xlsx')
+    assert names[1] == names[0].replace('.xlsx', '_2.xlsx')
+    assert names[2] == names[0].replace('.xlsx', '_3.xlsx')
+
+
+def test_split_values_differing_in_case_get_separate_files(tmp_path, monkeypatch):
+    # Windows file names are case-insensitive
+    monkeypatch.setattr(os.path, 'normcase', str.lower)
+    asn_df = pd.DataFrame({'GenericKey': ['PO1', 'po1', 'PO1'], 'Item:': ['A1', 'A2', 'A3']})
+
+    paths = write_split_outputs(asn_df, str(tmp_path / 'asn.csv'), 'GenericKey', max_workers=1)
+
+    assert [os.path.basename(path) for path in paths] == ['asn_PO1.csv', 'asn_po1_2.csv']
+    assert pd.read_csv(paths[1])['Item:'].tolist() == ['A2']
+
+
+def test_run_batch_keeps_same_named_sources_apart(tmp_path):
+    first = write_source(tmp_path / 'a' / 'ship.csv', ['A1', 'A2'])
+    second = write_source(tmp_path / 'b' / 'ship.csv', ['B1'])
+    output_dir = str(tmp_path / 'out')
+    os.makedirs(output_dir)
+
+    report = run_batch([first, second, first], MAPPINGS, {}, output_dir=output_dir, output_format='csv',
+                       max_workers=1)
+
+    assert [result['source'] for result in report['files']] == [first, second]
+    outputs = [result['output'] for result in report['files']]
+    assert len(set(outputs)) == 2
+    assert pd.read_csv(outputs[0])['Item:'].tolist() == ['A1', 'A2']
+    assert pd.read_csv(outputs[1])['Item:'].tolist() == ['B1']
+
+
+def test_unknown_split_column_is_reported(tmp_path):
+    with pytest.raises(ValueError, match="Cannot split by 'Bogus'.*Valid columns: .*GenericKey"):
+        check_split_column('Bogus')
+
+    source = write_source(tmp_path / 'ship.csv', ['A1'])
+    report = run_batch([source], MAPPINGS, {}, output_dir=str(tmp_path), split_column='Bogus', max_workers=1)
+    assert report['files'][0]['status'] == 'error'
+    assert "Cannot split by 'Bogus'" in report['files'][0]['error']
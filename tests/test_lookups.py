@@ -0,0 +1,142 @@
+import os
+
+import pandas as pd
+import pytest
+
+import asn_engine
+from asn_engine import (LookupCache, compile_plan, copy_lookup_file, ensure_lookup_columns, get_lookup_index,
+                        load_lookup_file, lookup_memory_usage)
+
+
+def write_lookup(tmp_path, name, lookup_df):
+    path = tmp_path / f"{name}.csv"
+    lookup_df.to_csv(path, index=False)
+    return load_lookup_file(str(path))
+
+
+def lookup_mapping(source_column, lookup_key, lookup_value, lookup_file='items', **options):
+    return {'type': 'Lookup', 'lookup_config': dict(options, lookup_file=lookup_file, source_column=source_column,
+                                                    lookup_key=lookup_key, lookup_value=lookup_value)}
+
+
+def test_composite_key_unmatched_row_with_blank_part(tmp_path):
+    items = write_lookup(tmp_path, 'items', pd.DataFrame({
+        'StorerKey': ['A', 'C'], 'Item': ['S1', 'S3'], 'Descr': ['first', 'third']}))
+    source_df = pd.DataFrame({'Owner': ['A', 'B', 'C'], 'SKU': ['S1', None, 'S3']})
+    mappings = {'LOTTABLE03': lookup_mapping(['Owner', 'SKU'], ['StorerKey', 'Item'], 'Descr')}
+
+    plan = compile_plan(mappings, list(source_df.columns))
+    asn_df, errors = plan.execute(source_df, {'items': items})
+
+    assert errors == []
+    assert asn_df['LOTTABLE03'].tolist() == ['first', '', 'third']
+    stats = plan.lookup_stats['Owner+SKU -> items.StorerKey+Item']
+    assert (stats['matched'], stats['unmatched'], stats['blank']) == (2, 1, 0)
+    assert stats['unmatched_examples'] == ['B|']
+
+
+def test_loading_a_copy_leaves_the_original_unchanged(tmp_path):
+    path = tmp_path / 'items.csv'
+    pd.DataFrame({'Item': ['S1', 'S2'], 'Descr': ['first', 'second'], 'Group': ['G1', 'G2']}).to_csv(path, index=False)
+    items = load_lookup_file(str(path), columns=['Item', 'Descr'])
+    get_lookup_index(items, 'Item').values('Descr')
+    original_indexes = dict(items['indexes'])
+    original_df = items['df']
+
+    loaded = copy_lookup_file(items)
+    ensure_lookup_columns(loaded, ['Group'])
+    get_lookup_index(loaded, 'Descr').values('Group')
+    get_lookup_index(loaded, 'Item').values('Group')
+
+    assert items['indexes'] == original_indexes and items['df'] is original_df
+    assert list(items['df'].columns) == ['Item', 'Descr']
+    assert set(items['indexes']['Item'].value_arrays) == {'Descr'}
+    assert set(loaded['indexes']) == {'Item', 'Descr'}
+    assert list(loaded['indexes']['Item'].lookup(pd.Series(['S2']), 'Group')) == ['G2']
+
+
+def run_lookup(tmp_path, keys, source_values, **options):
+    items = write_lookup(tmp_path, 'items', pd.DataFrame({'Item': keys, 'Descr': [f"d{key}" for key in keys]}))
+    source_df = pd.DataFrame({'SKU': source_values})
+    plan = compile_plan({'LOTTABLE03': lookup_mapping('SKU', 'Item', 'Descr', **options)}, ['SKU'])
+    asn_df, errors = plan.execute(source_df, {'items': items})
+    assert errors == []
+    [stats] = plan.lookup_stats.values()
+    return asn_df['LOTTABLE03'].tolist(), stats
+
+
+def test_leading_zeros_normalization_matches_padded_keys(tmp_path):
+    values, stats = run_lookup(tmp_path, ['000123', 'A7'], ['123', '0123', ' 123', 'a7'],
+                               normalize=['strip', 'casefold', 'leading_zeros'])
+
+    assert values == ['d000123', 'd000123', 'd000123', 'dA7']
+    assert stats['unmatched'] == 0
+
+
+def test_prefix_match_picks_the_longest_key(tmp_path):
+    values, stats = run_lookup(tmp_path, ['AB', 'ABCD', 'X1'], ['ABCD-01', 'ABZ', 'ABCD', 'Q9'], match='prefix')
+
+    assert values == ['dABCD', 'dAB', 'dABCD', '']
+    assert (stats['matched'], stats['unmatched']) == (3, 1)
+
+
+def test_fuzzy_match_difflib_fallback(tmp_path, monkeypatch):
+    monkeypatch.setattr(asn_engine, '_rapidfuzz_process', None)
+    values, stats = run_lookup(tmp_path, ['WIDGET-100', 'GADGET-200'],
+                               ['WIDGET-10O', 'GADGET-200', 'XIDGET-100', 'SPROCKET'], match='fuzzy', fuzzy_cutoff=0.85)
+
+    # Only keys sharing the first character are compared, so XIDGET-100 is a miss
+    assert values == ['dWIDGET-100', 'dGADGET-200', '', '']
+    assert (stats['matched'], stats['unmatched']) == (2, 2)
+
+
+def test_unmatched_keys_are_blank_and_reported(tmp_path):
+    values, stats = run_lookup(tmp_path, ['S1', 'S2'], ['S1', 'S9', None, 'S9'])
+
+    assert values == ['dS1', '', '', '']
+    assert (stats['matched'], stats['unmatched'], stats['blank']) == (1, 2, 1)
+    assert stats['unmatched_examples'] == ['S9']
+
+
+def test_lookup_columns_are_loaded_on_demand_and_compact(tmp_path):
+    path = tmp_path / 'items.csv'
+    pd.DataFrame({'Item': [f"S{number}" for number in range(10)], 'Group': ['G1', 'G2'] * 5,
+                  'Notes': [f"note {number}" for number in range(10)]}).to_csv(path, index=False)
+    items = load_lookup_file(str(path), columns=[])
+    assert items['df'] is None and items['columns'] == ['Item', 'Group', 'Notes']
+
+    source_df = pd.DataFrame({'SKU': ['S3', 'S4', 'S99']})
+    plan = compile_plan({'LOTTABLE03': lookup_mapping('SKU', 'Item', 'Group')}, ['SKU'])
+    asn_df, errors = plan.execute(source_df, {'items': items})
+
+    assert errors == []
+    assert asn_df['LOTTABLE03'].tolist() == ['G2', 'G1', '']
+    assert list(items['df'].columns) == ['Item', 'Group']
+    assert isinstance(items['df']['Group'].dtype, pd.CategoricalDtype)
+    assert not isinstance(items['df']['Item'].dtype, pd.CategoricalDtype)
+    assert lookup_memory_usage(items) > 0
+
+
+def test_lookup_cache_serves_unchanged_files_and_drops_edited_ones(tmp_path, monkeypatch):
+    pytest.importorskip('pyarrow')
+    path = tmp_path / 'items.csv'
+    pd.DataFrame({'Item': ['S1', 'S2', 'S1'], 'Descr': ['old', 'second', 'first']}).to_csv(path, index=False)
+    cache = LookupCache(str(tmp_path / 'cache'))
+    items = load_lookup_file(str(path), columns=['Item', 'Descr'], cache=cache)
+    get_lookup_index(items, 'Item')
+    entry_count = cache.stats()[0]
+    assert entry_count == 4  # Header, two columns and the key index
+
+    def no_parsing(*args, **kwargs):
+        raise AssertionError("Cached lookup file was parsed again")
+    with monkeypatch.context() as patch:
+        patch.setattr(asn_engine, 'load_dataframe', no_parsing)
+        cached = load_lookup_file(str(path), columns=['Item', 'Descr'], cache=LookupCache(str(tmp_path / 'cache')))
+        assert list(get_lookup_index(cached, 'Item').lookup(pd.Series(['S1', 'S2']), 'Descr')) == ['first', 'second']
+
+    pd.DataFrame({'Item': ['S1'], 'Descr': ['edited']}).to_csv(path, index=False)
+    os.utime(path, ns=(os.stat(path).st_atime_ns, os.stat(path).st_mtime_ns + 10 ** 9))
+    edited = load_lookup_file(str(path), columns=['Item', 'Descr'], cache=cache)
+    assert list(get_lookup_index(edited, 'Item').lookup(pd.Series(['S1']), 'Descr')) == ['edited']
+    assert cache.stats()[0] == entry_count  # The old version's entries were replaced
+    assert cache.clear(str(path)) == entry_count and cache.stats()[0] == 0
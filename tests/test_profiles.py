@@ -0,0 +1,25 @@
+from asn_engine import find_matching_profile, load_profile, match_profile_columns, save_profile
+
+MAPPINGS = {
+    'Item:': {'type': 'Direct', 'source_column': 'SKU'},
+    'LOTTABLE01': {'type': 'Multi-Select', 'selections': ['Lot', 'Qty']},
+    'Owner': {'type': 'Lookup', 'lookup_config': {'lookup_file': 'owners', 'source_column': ['SKU', 'Site'],
+                                                  'lookup_key': ['Item', 'Site'], 'lookup_value': 'Owner'}},
+    'Hold Code:': {'type': 'Manual Input', 'value': 'OK'},
+}
+
+
+def test_profile_matched_by_differently_cased_header_uses_source_names(tmp_path):
+    profile_dir = tmp_path / 'profiles'
+    save_profile(str(profile_dir / 'supplier.json'), MAPPINGS, {}, source_columns=['SKU', 'Qty', 'Lot', 'Site'])
+    columns = ['sku', 'QTY', ' Lot ', 'Site']
+
+    profile_path = find_matching_profile(columns, str(profile_dir))
+    mappings, lookup_paths = load_profile(profile_path)
+    matched = match_profile_columns(mappings, columns)
+
+    assert matched['Item:']['source_column'] == 'sku'
+    assert matched['LOTTABLE01']['selections'] == [' Lot ', 'QTY']
+    assert matched['Owner']['lookup_config']['source_column'] == ['sku', 'Site']
+    assert matched['Hold Code:'] == MAPPINGS['Hold Code:']
+    assert mappings['Item:']['source_column'] == 'SKU'
@@ -0,0 +1,54 @@
+import json
+import time
+
+import pandas as pd
+
+from asn_engine import RunProfiler, append_run_log, process_source_file
+
+MAPPINGS = {
+    'Item:': {'type': 'Direct', 'source_column': 'SKU'},
+    'Hold Code:': {'type': 'Manual Input', 'value': 'OK'},
+}
+
+
+def test_profiler_sums_repeated_phases_and_columns():
+    with RunProfiler() as profiler:
+        for _ in range(2):
+            with profiler.measure('direct', column='Item:') as block:
+                block['rows'] = 100
+                time.sleep(0.01)
+        with profiler.measure('write') as block:
+            block['rows'] = 200
+
+    report = profiler.report()
+    direct = report['phases']['direct']
+    assert direct['seconds'] >= 0.02
+    assert direct['rows_per_second'] == round(200 / profiler.phases['direct']['seconds'])
+    assert report['columns']['Item:']['seconds'] == direct['seconds']
+    assert set(report['phases']) == {'direct', 'write'}
+    assert report['total_seconds'] >= direct['seconds']
+
+
+def test_streamed_run_reports_each_phase_over_all_chunks(tmp_path):
+    source = tmp_path / 'source.csv'
+    pd.DataFrame({'SKU': [f"S{number}" for number in range(10)]}).to_csv(source, index=False)
+
+    result = process_source_file(str(source), MAPPINGS, {}, output_dir=str(tmp_path), output_format='csv',
+                                 chunk_rows=3)
+
+    assert result['status'] == 'ok', result.get('error')
+    profile = result['profile']
+    assert {'load', 'direct', 'manual_input', 'write'} <= set(profile['phases'])
+    assert set(profile['columns']) == {'Item:', 'Hold Code:'}
+    json.dumps(profile)
+
+
+def test_run_log_appends_one_json_line_per_record(tmp_path):
+    log_path = tmp_path / 'logs' / 'runs.jsonl'
+
+    append_run_log(str(log_path), {'source': 'a.csv', 'rows': 3})
+    append_run_log(str(log_path), {'source': 'b.csv', 'rows': 5})
+
+    records = [json.loads(line) for line in log_path.read_text(encoding='utf-8').splitlines()]
+    assert [(record['source'], record['rows']) for record in records] == [('a.csv', 3), ('b.csv', 5)]
+    assert all(record['time'] for record in records)
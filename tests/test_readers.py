@@ -0,0 +1,77 @@
+import pandas as pd
+import pytest
+
+from asn_engine import iter_source_chunks, load_dataframe
+
+CSV_CASES = {
+    'mixed': "SKU,Qty,Weight,Expiry,Flag,Remark\nA1,5,1.5,2025-01-31,True,x\nA2,,2,2025-02-01,,NA\nA3,7,,,False,\n",
+    'big_integers': "LPN,Serial,Qty\n12345678901234567890,123456789012345678901234,1\n5,7,2\n",
+    'blank_columns': "SKU,Blank,NA only\nA1,,NA\nA2,,\n",
+    'na_markers': "SKU,Lot\nA1,#N/A\nA2,NULL\nA3,None\nA4,n/a\n",
+    'duplicate_headers': "SKU,SKU,Qty\nA1,B1,1\nA2,B2,2\n",
+    'floats': "SKU,Weight,Price\nA1,1.4415961271963373,0.1\nA2,,2.675\nA3,7,123456.78901234567\n",
+}
+
+
+@pytest.mark.parametrize('case', sorted(CSV_CASES))
+def test_pyarrow_csv_matches_pandas(tmp_path, case):
+    pytest.importorskip('pyarrow')
+    path = tmp_path / f"{case}.csv"
+    path.write_text(CSV_CASES[case])
+
+    pd.testing.assert_frame_equal(load_dataframe(str(path), engine='pyarrow'),
+                                  load_dataframe(str(path), engine='pandas'), check_exact=True)
+
+
+def test_pyarrow_csv_column_subset_matches_pandas(tmp_path):
+    pytest.importorskip('pyarrow')
+    path = tmp_path / 'mixed.csv'
+    path.write_text(CSV_CASES['mixed'])
+
+    usecols = ['Remark', 'SKU']
+    pd.testing.assert_frame_equal(load_dataframe(str(path), usecols=usecols, engine='pyarrow'),
+                                  load_dataframe(str(path), usecols=usecols, engine='pandas'))
+
+
+def write_workbook(tmp_path):
+    path = tmp_path / 'shipment.xlsx'
+    pd.DataFrame({'SKU': ['A1', 'A2', None], 'Qty': [5, None, 7], 'Lot': ['L1', 'L2', 'L3']}).to_excel(path, index=False)
+    return str(path)
+
+
+@pytest.mark.parametrize('usecols', [None, ['Lot', 'SKU']])
+def test_calamine_matches_openpyxl(tmp_path, usecols):
+    pytest.importorskip('python_calamine')
+    path = write_workbook(tmp_path)
+
+    pd.testing.assert_frame_equal(load_dataframe(path, usecols=usecols, engine='calamine'),
+                                  load_dataframe(path, usecols=usecols, engine='openpyxl'))
+
+
+def test_calamine_header_probe_reads_rows_with_openpyxl(tmp_path, monkeypatch):
+    pytest.importorskip('python_calamine')
+    path = write_workbook(tmp_path)
+    engines = []
+    read_excel = pd.read_excel
+
+    def recording_read_excel(*args, **kwargs):
+        engines.append(kwargs.get('engine'))
+        return read_excel(*args, **kwargs)
+    monkeypatch.setattr(pd, 'read_excel', recording_read_excel)
+
+    assert list(load_dataframe(path, nrows=0, engine='calamine').columns) == ['SKU', 'Qty', 'Lot']
+    assert engines == ['openpyxl']
+
+
+def test_excel_error_cells_read_as_nan(tmp_path):
+    openpyxl = pytest.importorskip('openpyxl')
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    for row in (['SKU', 'Qty', 'Lot'], ['A1', 5, 'L1'], ['A2', '#DIV/0!', '#N/A'], ['A3', 7, '#REF!']):
+        sheet.append(row)
+    path = str(tmp_path / 'errors.xlsx')
+    workbook.save(path)
+
+    expected = pd.read_excel(path, engine='openpyxl')
+    pd.testing.assert_frame_equal(load_dataframe(path, usecols=['SKU', 'Qty', 'Lot'], engine='openpyxl'), expected)
+    pd.testing.assert_frame_equal(next(iter_source_chunks(path)), expected)
@@ -0,0 +1,32 @@
+import threading
+
+import pandas as pd
+
+from asn_engine import SourceCache, load_dataframe, probe_columns
+
+
+def test_source_cache_shared_between_threads(tmp_path):
+    columns = ['SKU', 'Qty', 'Lot', 'Owner']
+    path = str(tmp_path / 'source.csv')
+    pd.DataFrame({col: [f"{col}{number}" for number in range(200)] for col in columns}).to_csv(path, index=False)
+    source_cache = SourceCache()
+    failures = []
+
+    def worker(offset):
+        try:
+            for number in range(30):
+                wanted = [columns[(offset + number) % 4], columns[(offset + 2 * number) % 4]]
+                df = source_cache.get(path, load_dataframe, columns=wanted)
+                assert set(wanted) <= set(df.columns) and len(df) == 200
+                assert source_cache.header(path, probe_columns) == columns
+        except Exception as e:
+            failures.append(e)
+
+    threads = [threading.Thread(target=worker, args=(offset,)) for offset in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert failures == []
+    assert source_cache.total_bytes == sum(nbytes for df, nbytes, cached in source_cache._entries.values())
@@ -0,0 +1,57 @@
+import pandas as pd
+import pytest
+
+from asn_engine import process_source_file
+
+MAPPINGS = {
+    'Item:': {'type': 'Direct', 'source_column': 'SKU'},
+    'Expected Qty:': {'type': 'Direct', 'source_column': 'Qty'},
+    'LOTTABLE01': {'type': 'Multi-Select', 'selections': ['Qty', 'Lot']},
+    'Hold Code:': {'type': 'Manual Input', 'value': 'OK'},
+    'Gross Weight:': {'type': 'Direct', 'source_column': 'Weight'},
+}
+
+
+def write_xlsx_source(path):
+    # Blanks only in the second chunk of three rows
+    pd.DataFrame({
+        'SKU': [f"S{number}" for number in range(1, 10)],
+        'Qty': [1, 2, 3, None, 5, 6, 7, 8, 9],
+        'Lot': ['A', 'B', 'C', 'D', None, 'F', 'G', 'H', 'I'],
+        'Weight': [1.4415961271963373, 0.1, 2.675, 4, None, 0.3333333333333333, 7.25, 123456.78901234567, 9],
+    }).to_excel(path, index=False)
+    return str(path)
+
+
+def generate(source, tmp_path, name, **options):
+    output_dir = tmp_path / name
+    output_dir.mkdir()
+    result = process_source_file(source, MAPPINGS, {}, output_dir=str(output_dir), **options)
+    assert result['status'] == 'ok', result.get('error')
+    return result['output']
+
+
+def test_streamed_xlsx_source_matches_full_load(tmp_path):
+    source = write_xlsx_source(tmp_path / 'source.xlsx')
+
+    full = pd.read_excel(generate(source, tmp_path, 'full'))
+    streamed = pd.read_excel(generate(source, tmp_path, 'streamed', chunk_rows=3))
+
+    pd.testing.assert_frame_equal(streamed, full)
+    assert full['LOTTABLE01'].tolist() == ['1.0|A', '2.0|B', '3.0|C', 'D', '5.0', '6.0|F', '7.0|G', '8.0|H',
+                                      '9.0|I']
+
+
+@pytest.mark.parametrize('source_format', ['csv', 'xlsx'])
+def test_streamed_csv_output_is_byte_identical(tmp_path, source_format):
+    source = write_xlsx_source(tmp_path / 'source.xlsx')
+    if source_format == 'csv':
+        csv_source = tmp_path / 'source.csv'
+        pd.read_excel(source).to_csv(csv_source, index=False)
+        source = str(csv_source)
+
+    full = generate(source, tmp_path, 'full', output_format='csv')
+    streamed = generate(source, tmp_path, 'streamed', output_format='csv', chunk_rows=3)
+
+    with open(full, 'rb') as full_file, open(streamed, 'rb') as streamed_file:
+        assert streamed_file.read() == full_file.read()
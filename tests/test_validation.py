@@ -0,0 +1,25 @@
+import pandas as pd
+
+from asn_engine import AsnValidator, compile_plan, iter_source_chunks, load_dataframe
+
+MAPPINGS = {
+    'Item:': {'type': 'Direct', 'source_column': 'SKU'},
+    'Expected Qty:': {'type': 'Direct', 'source_column': 'Qty'},
+}
+
+
+def test_chunked_validation_matches_full_validation(tmp_path):
+    # The blank makes the second chunk's Qty float (2.0) while the first is int (2)
+    source = tmp_path / 'source.xlsx'
+    pd.DataFrame({'SKU': ['A', 'B', 'C', 'B', 'D'], 'Qty': [1, 2, None, 2, 4]}).to_excel(source, index=False)
+    plan = compile_plan(MAPPINGS, ['SKU', 'Qty'])
+
+    full = AsnValidator(plan)
+    full.check(plan.execute(load_dataframe(str(source)), {})[0])
+    chunked = AsnValidator(plan, chunked=True)
+    for chunk in iter_source_chunks(str(source), chunk_rows=2):
+        chunked.check(plan.execute(chunk, {})[0])
+
+    pd.testing.assert_frame_equal(chunked.report(), full.report())
+    duplicates = full.report().query("Issue == 'duplicate line'")
+    assert duplicates[['Row', 'Value']].values.tolist() == [[5, 'same as row 3']]
@@ -0,0 +1,30 @@
+import pandas as pd
+
+from asn_watch import InboundWatcher
+
+MAPPINGS = {
+    'Item:': {'type': 'Direct', 'source_column': 'SKU'},
+    'Expected Qty:': {'type': 'Direct', 'source_column': 'Qty'},
+}
+
+
+def test_watcher_never_overwrites_earlier_outputs(tmp_path):
+    inbound = tmp_path / 'inbound'
+    output_dir = tmp_path / 'output'
+    inbound.mkdir()
+    output_dir.mkdir()
+    pd.DataFrame({'SKU': ['C1'], 'Qty': [1]}).to_csv(inbound / 'a.csv', index=False)
+    pd.DataFrame({'SKU': ['X1'], 'Qty': [2]}).to_excel(inbound / 'a.xlsx', index=False)
+    records = []
+
+    watcher = InboundWatcher(str(inbound), MAPPINGS, {}, {'output_dir': str(output_dir), 'output_format': 'csv'},
+                             done_dir=str(inbound / 'done'), error_dir=str(inbound / 'error'),
+                             max_workers=1, settle_seconds=0, poll_seconds=0.05, log=records.append)
+    watcher.run(exit_when_idle=True)
+
+    processed = [record for record in records if record.get('event') == 'processed']
+    assert [record['status'] for record in processed] == ['ok', 'ok']
+    outputs = sorted(record['output'] for record in processed)
+    assert len(set(outputs)) == 2
+    items = sorted(pd.read_csv(output)['Item:'].iloc[0] for output in outputs)
+    assert items == ['C1', 'X1']
@@ -0,0 +1,81 @@
+import os
+
+import pandas as pd
+import pytest
+
+from asn_engine import CsvRowWriter, XlsxRowWriter, compile_plan, write_output
+
+MAPPINGS = {
+    'Item:': {'type': 'Direct', 'source_column': 'SKU'},
+    'Expected Qty:': {'type': 'Direct', 'source_column': 'Qty'},
+    'Hold Code:': {'type': 'Manual Input', 'value': 'OK'},
+}
+
+
+def generate_asn():
+    source_df = pd.DataFrame({'SKU': ['S1', 'S2', 'S3'], 'Qty': [1, None, 3.5]})
+    asn_df, errors = compile_plan(MAPPINGS, list(source_df.columns)).execute(source_df, {})
+    assert errors == []
+    return asn_df
+
+
+def read_back(path):
+    return pd.read_csv(path) if path.endswith('.csv') else pd.read_excel(path)
+
+
+@pytest.mark.parametrize('extension', ['.csv', '.xlsx'])
+def test_constant_columns_are_written_as_their_value(tmp_path, extension):
+    asn_df = generate_asn()
+    assert isinstance(asn_df['Hold Code:'].dtype, pd.CategoricalDtype)
+    assert isinstance(asn_df['Messages'].dtype, pd.CategoricalDtype)
+    path = str(tmp_path / f"asn{extension}")
+
+    write_output(asn_df, path)
+
+    written = read_back(path)
+    assert list(written.columns) == list(asn_df.columns)
+    assert written['Hold Code:'].tolist() == ['OK', 'OK', 'OK']
+    assert written['Messages'].isna().all()
+    assert written['Item:'].tolist() == ['S1', 'S2', 'S3']
+
+
+def sample_frame():
+    return pd.DataFrame({
+        'Item:': ['S1', 'S2', '', 'S4'],
+        'Expected Qty:': [1.0, None, 3.5, 4.0],
+        'Line #:': [1, 2, 3, 4],
+        'LOTTABLE04': pd.to_datetime(['2025-01-31 17:45', None, '2025-02-01 08:30', '2025-03-01 00:00']),
+    })
+
+
+@pytest.mark.parametrize('engine', ['openpyxl', 'xlsxwriter'])
+def test_xlsx_row_writer_matches_to_excel(tmp_path, engine):
+    pytest.importorskip(engine)
+    asn_df = sample_frame()
+    expected_path = str(tmp_path / 'expected.xlsx')
+    asn_df.to_excel(expected_path, index=False)
+
+    path = str(tmp_path / 'streamed.xlsx')
+    writer = XlsxRowWriter(path, engine=engine)
+    writer.append(list(asn_df.columns))
+    writer.append_frame(asn_df, chunk_rows=3)
+    writer.close()
+
+    assert writer.row_count == len(asn_df) + 1
+    pd.testing.assert_frame_equal(pd.read_excel(path), pd.read_excel(expected_path))
+
+
+def test_csv_row_writer_matches_to_csv(tmp_path):
+    asn_df = sample_frame()
+    expected_path = tmp_path / 'expected.csv'
+    asn_df.to_csv(expected_path, index=False, lineterminator=os.linesep)
+
+    path = tmp_path / 'streamed.csv'
+    writer = CsvRowWriter(str(path))
+    writer.append(list(asn_df.columns))
+    writer.append_frame(asn_df.iloc[:2])
+    writer.append_frame(asn_df.iloc[2:])
+    writer.close()
+
+    assert writer.row_count == len(asn_df) + 1
+    assert path.read_bytes() == expected_path.read_bytes()